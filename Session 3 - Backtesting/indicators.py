@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def crossover(fast, slow) -> np.ndarray:
+    """
+    Detect crossovers between two series with shifted comparisons over whole arrays.
+
+    Args:
+        fast: array-like of values, 1D or 2D with time along axis 0.
+        slow: array-like of values, same shape as fast.
+
+    Returns:
+        int8 array with the same shape as the inputs:
+            1 where fast crosses above slow, -1 where fast crosses below slow, 0 otherwise.
+            The first row is always 0.
+
+    Raises:
+        None.
+    """
+
+    fast = np.asarray(fast, dtype=np.float64)
+    slow = np.asarray(slow, dtype=np.float64)
+
+    prev_fast, prev_slow = fast[:-1], slow[:-1]
+    curr_fast, curr_slow = fast[1:], slow[1:]
+
+    cross = np.zeros(fast.shape, dtype=np.int8)
+    cross[1:][(prev_slow > prev_fast) & (curr_fast > curr_slow)] = 1
+    cross[1:][(prev_slow < prev_fast) & (curr_fast < curr_slow)] = -1
+
+    return cross
+
+
+def cross_labels(cross: np.ndarray, up="BUY", down="SELL") -> np.ndarray:
+    """
+    Map crossover() output to an object array of signal labels, None where no cross occurred.
+    """
+
+    labels = np.full(cross.shape, None, dtype=object)
+    labels[cross == 1] = up
+    labels[cross == -1] = down
+
+    return labels
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from indicators import crossover, cross_labels
+
 
 class EMACross50200:
 
@@ -17,26 +19,9 @@ class EMACross50200:
         """
         slow_ema = data['Close'].ewm(span=slow, adjust=False).mean().rename('EMA200')
         fast_ema = data['Close'].ewm(span=fast, adjust=False).mean().rename('EMA50')
-        cross = pd.Series(None, index=data.index).rename("Cross")
-
-        # Populate cross column.
-        # If using timeframes more granular than 1d you'll want to optimise this to cut processing time.
-        # (or if using more than 1-2k bars per dataset)
-        temp_df = pd.concat([fast_ema, slow_ema], axis=1)
-        for index in range(0, temp_df.shape[0]):
-            if index > 0:
-                prev_slow = temp_df.iloc[index - 1]["EMA200"]
-                prev_fast = temp_df.iloc[index - 1]["EMA50"]
-                curr_slow = temp_df.iloc[index]["EMA200"]
-                curr_fast = temp_df.iloc[index]["EMA50"]
-
-                # Buy side check (fast crosses above slow)
-                if (prev_slow > prev_fast) and (curr_fast > curr_slow):
-                    cross.iloc[index] = "BUY"
-
-                # Sell side check (slow crosses above fast)
-                elif (prev_slow < prev_fast) and (curr_fast < curr_slow):
-                    cross.iloc[index] = "SELL"
+
+        # Populate cross column: BUY where fast crosses above slow, SELL where slow crosses above fast.
+        cross = pd.Series(cross_labels(crossover(fast_ema, slow_ema)), index=data.index).rename("Cross")
 
         return [("50EMA", fast_ema), ("200EMA", slow_ema), ("Cross", cross)]
 
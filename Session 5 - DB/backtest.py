@@ -1,7 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 from os import listdir
+import heapq
 import pandas as pd
+import numpy as np
 import psycopg2
 
+from timestamps import TIMEFRAME_NS, to_epoch_index, to_epoch, to_datetime
+from validation import validate_datasets, summarise_report
+from feature_cache import FeatureCache, dataset_hash
+from feature_graph import Feature, FeatureGraph
+from correlation import CorrelationIndex, pairwise_correlation
+from matrix import stack_columns
+from parallel import evaluate_parallel, partition_signals
+from frames import build_feature_frame, Columns, RowCursor
+from lazy import LazyColumns
+from vectorized import signal_bars, stop_bar, position_fills, trade_pnl, target_delta
+
 # pd.set_option('display.max_rows', None)
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
@@ -24,16 +38,43 @@ SYMBOLS = EQUITIES + CURRENCIES + COMMODITIES + INDICES + CRYPTO
 
 class Backtester:
 
-    def __init__(self, portfolio):
-        self.data = self.load_local_data(SYMBOLS)
+    def __init__(self, portfolio, repair_data=False, use_feature_cache=True, matrix_features=True, feature_workers=1,
+                 lazy_features=False, event_driven=False, multi_timeframe=False, vectorized=False,
+                 simulation_workers=None, data=None, use_database=True, full_history_features=False):
+        # Pre-loaded data (see load_local_data()) may be shared between backtesters: datasets are replaced, not
+        # modified, during pre-processing, so each backtester only needs its own copy of the nested dicts.
+        if data is None:
+            self.data = self.load_local_data(SYMBOLS)
+        else:
+            self.data = {a: {s: dict(timeframes) for s, timeframes in symbols.items()} for a, symbols in data.items()}
         self.portfolio = portfolio
+        self.feature_cache = FeatureCache() if use_feature_cache else None
+        self.matrix_features = matrix_features
+        # Features are computed in this process unless more workers are given: starting a pool costs more than
+        # computing the features of a typical portfolio's datasets (see parallel.evaluate_parallel()).
+        self.feature_workers = feature_workers or 1
+        self.lazy_features = lazy_features
+        self.event_driven = event_driven
+        self.multi_timeframe = multi_timeframe
+        self.vectorized = vectorized
+        self.simulation_workers = simulation_workers
+        self.use_database = use_database
+        self.full_history_features = full_history_features
+        self.data_report = self.validate_data(self.data, repair_data)
+        self.arrays = {}            # arrays[asset_class][symbol][timeframe][column] = np.ndarray view of self.data
+        self.columns = {}           # columns[asset_class][symbol][timeframe] = Columns (LazyColumns if lazy_features)
+        self.cursors = {}           # cursors[asset_class][symbol][timeframe] = RowCursor over columns
+        self.graph = None           # FeatureGraph of the portfolio's strategies
         self.c_matrix = None
+        self.correlations = {}      # correlations[timeframe] = CorrelationIndex
         self.active = True
         self.db_conn = None
 
-    def load_local_data(self, symbols: list) -> dict:
+    @staticmethod
+    def load_local_data(symbols: list) -> dict:
         """
         Expects data to be stored at ./data/ with filename "ticker_timeframe_startdate_enddate.csv"
+        Dataframes are indexed by int64 epoch nanosecond timestamps (see timestamps.py).
 
         Args:
             symbols: list of ticker codes to load.
@@ -71,6 +112,7 @@ class Backtester:
                 df.columns.values[0] = "Date"
                 df["Date"] = pd.to_datetime(df["Date"])
                 df.set_index("Date", inplace=True)
+                df.index = to_epoch_index(df.index)
 
                 asset_class = None
                 if symbol in EQUITIES:
@@ -90,15 +132,42 @@ class Backtester:
 
         return data
 
-    def apply_features_all_datasets(self, root: dict, strategies: list, symbols: list) -> None:
+    def validate_data(self, root: dict, repair=False) -> pd.DataFrame:
+        """
+        Run data-quality checks over all loaded datasets and print a summary of any issues found.
+
+        Args:
+            root: nested dict of dataframes as formatted by load_local_data().
+            repair: if True, replace datasets that have issues with repaired copies (see validation.py).
+
+        Returns:
+            Report dataframe with one row per dataset.
+
+        Raises:
+            None.
+        """
+
+        report = validate_datasets(root, repair=repair)
+        print(summarise_report(report))
+
+        return report
+
+    def apply_features_all_datasets(self, root: dict, strategies: list, symbols: list, start=None, finish=None) -> None:
         """
         Generates and applies features to existing datasets.
 
+        Features are computed only over bars from start (less the warm-up declared by the features, see
+        feature_graph.py) to finish. Feature columns are 0 outside that window. With full_history_features
+        set they are computed over whole datasets instead, so runs over different windows of the same data
+        share cached features (see walk_forward.py).
+
         Args:
             root: nested dict of dataframes as formatted by load_local_data().
             i.e data[asset_class][symbol][timeframe]
             strategies: list of strategy objects from target portfolio.
             symbols: flattened list of symbols from target portfolio.
+            start: optional epoch nanosecond timestamp of the first simulated bar.
+            finish: optional epoch nanosecond timestamp of the last simulated bar.
 
         Returns:
             None (modifies root dictionary contents in place).
@@ -109,40 +178,151 @@ class Backtester:
 
         print("Applying feature data...")
 
-        # Iterate all stored data.
+        # Merge features declared by all strategies so shared nodes are computed once per dataset.
+        graph = FeatureGraph(strategies)
+        warmup = graph.warmup()
+        self.graph = graph
+        print(graph.summary())
+
+        # Collect datasets we need, grouped by timeframe.
+        targets = {}
         for asset_class in root.keys():
             for symbol in root[asset_class].keys():
                 for timeframe in root[asset_class][symbol].keys():
+                    if symbol in symbols:
+                        targets.setdefault(timeframe, []).append((asset_class, symbol))
+
+        for timeframe, datasets in targets.items():
+            frames = [root[asset_class][symbol][timeframe] for asset_class, symbol in datasets]
+
+            # Source rows [first, last) of each dataset to compute features over.
+            windows = []
+            for df in frames:
+                if self.full_history_features:
+                    windows.append((0, df.shape[0]))
+                    continue
+                first = max(int(df.index.searchsorted(start)) - warmup, 0) if start is not None else 0
+                last = int(df.index.searchsorted(finish, side="right")) if finish is not None else df.shape[0]
+                windows.append((first, last))
+
+            # Hash the raw datasets (windows) before any feature columns are added.
+            data_hashes = None
+            if self.feature_cache and not self.lazy_features:
+                data_hashes = [dataset_hash(df.iloc[first:last]) for df, (first, last) in zip(frames, windows)]
+
+            # Lazy mode computes its own window, so gets whole columns.
+            if self.lazy_features:
+                columns = [{column: df[column].to_numpy() for column in graph.inputs} for df in frames]
+            else:
+                columns = [{column: df[column].to_numpy()[first:last] for column in graph.inputs}
+                           for df, (first, last) in zip(frames, windows)]
+
+            # Lazy mode leaves features to be computed when strategies first read them (see lazy.py).
+            # Matrix path computes each feature for every symbol of the timeframe in one call.
+            # With more than one worker, datasets are split across a process pool instead (see parallel.py).
+            if self.lazy_features:
+                features = [{} for df in frames]
+            elif self.feature_workers > 1 and len(frames) > 1:
+                features = evaluate_parallel(graph, columns, self.feature_workers, self.feature_cache, data_hashes,
+                                             self.matrix_features)
+            elif self.matrix_features:
+                features = graph.evaluate_many(columns, self.feature_cache, data_hashes)
+            else:
+                features = [graph.evaluate(columns[i], self.feature_cache, data_hashes[i] if data_hashes else None)
+                            for i in range(len(frames))]
+
+            for (asset_class, symbol), df, source, values, window in zip(datasets, frames, columns, features, windows):
+
+                # Re-index date column such that non-24/7 markets have continuous time series, one row per bar
+                # of the timeframe. Timeframes without a fixed bar duration keep their own index.
+                first_bar = df.index[0]
+                last_bar = df.index[-1]
+                step = TIMEFRAME_NS[timeframe]
+                if step is None:
+                    index = pd.Index(df.index.values, name="Date")
+                else:
+                    index = pd.Index(first_bar + step * np.arange((last_bar - first_bar) // step + 1), name="Date")
+                rows = index.get_indexer(df.index)
+
+                # Build the re-indexed frame with feature columns and ticker column (used later for correlation)
+                # in one allocation, keeping the column arrays for direct access in the simulation loop.
+                frame, arrays = build_feature_frame(df, values, index, symbol, first=window[0])
+                root[asset_class][symbol][timeframe] = frame
+                self.arrays.setdefault(asset_class, {}).setdefault(symbol, {})[timeframe] = arrays
+
+                if self.lazy_features:
+                    columns = LazyColumns(graph, source, rows, arrays, index.values)
+                else:
+                    columns = Columns(arrays, index.values, rows)
+                self.columns.setdefault(asset_class, {}).setdefault(symbol, {})[timeframe] = columns
+                self.cursors.setdefault(asset_class, {}).setdefault(symbol, {})[timeframe] = RowCursor(columns)
+
+        if self.feature_cache:
+            print(f"Feature cache: {self.feature_cache.hits} hits, {self.feature_cache.misses} misses.")
+        print("Feature data complete.")
+
+    def apply_cross_sectional_features(self, root: dict, symbols: list) -> None:
+        """
+        Compute the graph's cross-sectional features (see feature_graph.CrossSectionalFeature) and add them
+        to each dataset. Must run after apply_features_all_datasets().
 
-                    # Only apply features to datasets we need.
+        Inputs of all symbols of a timeframe are aligned on timestamp into one (bars x symbols) matrix, as
+        aligned_closes(), so each row holds every symbol's value at the same time whatever each market's
+        calendar. Bars a symbol doesn't have, or where its market is closed (zero close), are NaN. Each
+        symbol's output column is mapped back to the rows of its own dataset.
+
+        Args:
+            root: nested dict of dataframes as formatted by load_local_data().
+            symbols: flattened list of symbols from target portfolio.
+
+        Returns:
+            None (modifies root dictionary contents in place).
+
+        Raises:
+            None.
+        """
+
+        if self.graph is None or len(self.graph.cross_sectional) == 0:
+            return
+
+        targets = {}
+        for asset_class in self.arrays:
+            for symbol in self.arrays[asset_class]:
+                for timeframe in self.arrays[asset_class][symbol]:
                     if symbol in symbols:
+                        targets.setdefault(timeframe, []).append((asset_class, symbol))
 
-                        # Iterate strategies used by the portfolio.
-                        for strategy in strategies:
+        for timeframe, datasets in targets.items():
+            indexes = [root[asset_class][symbol][timeframe].index.values for asset_class, symbol in datasets]
+            timestamps = np.unique(np.concatenate(indexes))
 
-                            # Iterate individual features needed by each strategy.
-                            for feature in strategy.feature_data(root[asset_class][symbol][timeframe]):
-                                col_count = root[asset_class][symbol][timeframe].shape[1]
-                                root[asset_class][symbol][timeframe].insert(col_count, feature[0], feature[1])
+            # Row of the aligned matrix of each dataset row, and the rows with a real (non zero) close.
+            positions = [np.searchsorted(timestamps, index) for index in indexes]
+            open_rows = [self.arrays[asset_class][symbol][timeframe]['Close'] != 0 for asset_class, symbol in datasets]
 
-                            # Re-index date column such that non-24/7 markets have continuous time series.
-                            start = root[asset_class][symbol][timeframe].iloc[0].name
-                            finish = root[asset_class][symbol][timeframe].iloc[-1].name
-                            index = pd.date_range(start, finish)
-                            root[asset_class][symbol][timeframe] = root[asset_class][symbol][timeframe].reindex(index, fill_value=0)
+            for name, feature in self.graph.cross_sectional.items():
+                column = feature.input.name if isinstance(feature.input, Feature) else feature.input
 
-                            # Add ticker column value, used later for correlation.
-                            root[asset_class][symbol][timeframe]['Ticker'] = symbol
+                matrix = np.full((len(timestamps), len(datasets)), np.nan)
+                for number, (asset_class, symbol) in enumerate(datasets):
+                    values = np.asarray(self.columns[asset_class][symbol][timeframe].column(column), dtype=np.float64)
+                    matrix[positions[number][open_rows[number]], number] = values[open_rows[number]]
 
-                        # print(symbol, timeframe)
-                        # print(root[asset_class][symbol][timeframe])
+                outputs = feature.function(matrix, **feature.params)
 
-        print("Feature data complete.")
+                for number, (asset_class, symbol) in enumerate(datasets):
+                    values = outputs[positions[number], number]
+                    root[asset_class][symbol][timeframe][name] = values
+                    self.arrays[asset_class][symbol][timeframe][name] = values
 
-    def correlation_matrix(self, root: dict, timeframes: list, symbols: list) -> pd.DataFrame:
+    def correlation_matrix(self, root: dict, timeframes: list, symbols: list) -> dict:
         """
         Create correlation matrix from source datasets.
 
+        Close prices of each timeframe are aligned on timestamp into one (bars x symbols) array, with zero
+        closes (padded bars, market closed) and missing bars as NaN. Each pair of symbols is correlated over
+        the bars where both have prices. Timeframes are computed in parallel threads (NumPy releases the GIL).
+
         Args:
             root: nested dict of dataframes as formatted by load_local_data().
                 e.g data[asset_class][symbol][timeframe]
@@ -157,33 +337,514 @@ class Backtester:
             None.
         """
 
-        c_matrix = {}
+        aligned = {timeframe: self.aligned_closes(root, timeframe, symbols) for timeframe in timeframes}
+
+        with ThreadPoolExecutor(max_workers=max(len(timeframes), 1)) as pool:
+            matrices = dict(zip(timeframes, pool.map(lambda t: pairwise_correlation(aligned[t][1]), timeframes)))
 
-        # Aggregate close prices for each timeframe.
+        c_matrix = {}
         for timeframe in timeframes:
+            names = aligned[timeframe][0]
+            c_matrix[timeframe] = pd.DataFrame(matrices[timeframe], index=names, columns=pd.Index(names, name="Ticker"))
 
-            data_to_agg = []
+        return c_matrix
 
+    def aligned_closes(self, root: dict, timeframe: str, symbols: list) -> tuple:
+        """
+        Close prices of the given symbols aligned on timestamp.
+
+        Returns:
+            (symbols found, (bars x symbols) float array), NaN where a symbol has no bar or a zero close.
+        """
+
+        found = []
+        frames = []
+        for asset_class in root.keys():
+            for symbol in root[asset_class].keys():
+                if symbol in symbols and timeframe in root[asset_class][symbol]:
+                    found.append(symbol)
+                    frames.append(root[asset_class][symbol][timeframe])
+
+        timestamps = np.unique(np.concatenate([df.index.values for df in frames])) if frames else np.array([], dtype=np.int64)
+
+        matrix = np.full((len(timestamps), len(frames)), np.nan)
+        for column, df in enumerate(frames):
+            matrix[np.searchsorted(timestamps, df.index.values), column] = df['Close'].to_numpy(dtype=np.float64)
+        matrix[matrix == 0] = np.nan
+
+        return found, matrix
+
+    def close_matrix(self, root: dict, timeframe: str, symbols: list) -> tuple:
+        """
+        Close prices of the given symbols aligned by row position as iterated by start().
+
+        Returns:
+            (symbols found, (bars x symbols) float array), one column per symbol found, in symbols order.
+            Padded rows (zero close, i.e. market closed) are NaN. Symbols without a dataset of the timeframe
+            have no column.
+        """
+
+        found = []
+        closes = []
+        for symbol in symbols:
             for asset_class in root.keys():
-                for symbol in root[asset_class].keys():
+                if symbol in root[asset_class] and timeframe in root[asset_class][symbol]:
+                    found.append(symbol)
+                    closes.append(root[asset_class][symbol][timeframe]['Close'].to_numpy(dtype=np.float64))
+                    break
 
-                    # Only run correlation for datasets we need.
-                    if symbol in symbols:
+        matrix = stack_columns(closes) if closes else np.empty((0, 0))
+        matrix[matrix == 0] = np.nan
 
-                        data_to_agg.append(root[asset_class][symbol][timeframe])
+        return found, matrix
 
-            agg_data = pd.concat(data_to_agg).reset_index()
-            agg_data.columns.values[0] = "Date"
-            agg_data = agg_data[['Date', 'Ticker', 'Close']]
-            # print(agg_data)
+    def bar(self, asset_class: str, symbol: str, timeframe: str, index: int):
+        """
+        Return row index of a dataset as given to strategies and the portfolio, as the dataset's RowCursor
+        moved to index (see frames.py). Reads the column arrays directly, no Series is built.
+        """
 
-            reorg_data = agg_data.pivot('Date', 'Ticker', 'Close').reset_index()
-            matrix = reorg_data.corr(method="pearson")
-            matrix.index.name = None
+        cursor = self.cursors[asset_class][symbol][timeframe]
+        cursor.position = index
 
-            c_matrix[timeframe] = matrix
+        return cursor
 
-        return c_matrix
+    def last_bar(self, asset_class: str, symbol: str, timeframe: str, index: int) -> int:
+        """
+        Row of the last real bar of a dataset at or before index, skipping padded rows (market closed, zero close).
+        Returns index if there is none.
+        """
+
+        real = np.flatnonzero(self.arrays[asset_class][symbol][timeframe]['Close'][:index + 1])
+        return int(real[-1]) if len(real) > 0 else index
+
+    def check_signal(self, asset_class: str, symbol: str, strategy, index: int, final_index: int) -> None:
+        """
+        Check a strategy for a signal on bar index of a dataset and action it.
+        On the final bar, also calculate upnl for the open position based on the last close price.
+        """
+
+        signal = strategy.check_for_signal(self.bar(asset_class, symbol, strategy.timeframe, index))
+        self.apply_signal(asset_class, symbol, strategy, signal, index, final_index)
+
+    def apply_signal(self, asset_class: str, symbol: str, strategy, signal: dict, index: int, final_index: int) -> None:
+        """
+        Action a strategy's signal (or None) for bar index of a dataset, see check_signal().
+        """
+
+        if signal:
+            signal['asset_class'] = asset_class
+            signal['symbol'] = symbol
+            signal['timeframe'] = strategy.timeframe
+            signal['strategy'] = strategy.name
+            signal['mode'] = "SIGNAL"
+            self.process_signal(signal)
+
+        if index == final_index:
+            row = self.last_bar(asset_class, symbol, strategy.timeframe, index)
+            close = self.arrays[asset_class][symbol][strategy.timeframe]['Close'][row]
+            timestamp = self.data[asset_class][symbol][strategy.timeframe].index[row]
+            self.portfolio.calculate_open_equity_for_position(asset_class, symbol, strategy, close, timestamp)
+
+    def check_stops(self, asset_class: str, symbol: str, strategy, index: int) -> None:
+        """
+        Check a strategy's open position on a dataset for triggered resting orders on bar index.
+        """
+
+        signal = self.portfolio.update_price(self.bar(asset_class, symbol, strategy.timeframe, index), strategy.name)
+        if signal:
+            signal['asset_class'] = asset_class
+            signal['symbol'] = symbol
+            signal['timeframe'] = strategy.timeframe
+            signal['strategy'] = strategy.name
+            self.process_signal(signal)
+
+    def run_bars(self, strategies: list, start_index: int, finish_index: int) -> None:
+        """
+        Simulate bars [start_index, finish_index), visiting every symbol and strategy on every bar.
+        """
+
+        # Iterate dataframes timestamp by timestamp.
+        for index in range(start_index, finish_index):
+            if self.active:
+                self.portfolio.bar_index = index
+
+                for asset_class in self.portfolio.assets:
+                    for symbol in self.portfolio.assets[asset_class]:
+
+                        # Positions can be opened/closed/modified two ways:
+                        # 1. Directly with a buy/sell signal, as derived from feature data during pre-processing
+                        for strategy in strategies:
+                            self.check_signal(asset_class, symbol, strategy, index, finish_index - 1)
+
+                        # 2. If price movement triggers a resting order.
+                        for strategy in strategies:
+                            self.check_stops(asset_class, symbol, strategy, index)
+
+    def signal_bars(self, asset_class: str, symbol: str, strategy, start_index: int, finish_index: int) -> np.ndarray:
+        """
+        Bars in [start_index, finish_index) of a dataset on which strategy may signal.
+
+        Strategies with a "signal_column" attribute only signal where that column is set (not None or 0),
+        others are assumed to be able to signal on every bar.
+        """
+        return signal_bars(self.columns[asset_class][symbol][strategy.timeframe], strategy, start_index, finish_index)
+
+    def stop_bar(self, position: dict, index: int, finish_index: int) -> int:
+        """
+        First bar in [index, finish_index) on which position's stop triggers, or None.
+        """
+
+        arrays = self.arrays[position['asset_class']][position['symbol']][position['timeframe']]
+        return stop_bar(arrays, position['direction'], position['stop'], index, finish_index)
+
+    def run_events(self, strategies: list, start_index: int, finish_index: int) -> None:
+        """
+        Simulate bars [start_index, finish_index) visiting only bars with events, giving the same results as run_bars().
+
+        Events are kept in a heap ordered as run_bars() visits them: (bar, symbol, phase, strategy), with
+        phase 0 for signal checks and 1 for stop checks. Signal events are precomputed from each strategy's
+        signal_column (see signal_bars()). When a position opens, the first bar its stop triggers is found with
+        one vectorized search and queued as a stop event, which is skipped if the position has closed by then.
+        Loop cost scales with the number of events rather than bars x symbols x strategies.
+        """
+
+        datasets = [(asset_class, symbol) for asset_class in self.portfolio.assets
+                    for symbol in self.portfolio.assets[asset_class]]
+        final_index = finish_index - 1
+
+        events = []
+        for d, (asset_class, symbol) in enumerate(datasets):
+            for s, strategy in enumerate(strategies):
+                bars = self.signal_bars(asset_class, symbol, strategy, start_index, finish_index)
+
+                # Every dataset is visited on the final bar to calculate upnl.
+                if final_index >= start_index and (len(bars) == 0 or bars[-1] != final_index):
+                    bars = np.append(bars, final_index)
+                events.extend((int(bar), d, 0, s, None) for bar in bars)
+        heapq.heapify(events)
+
+        sequence = 0
+        while events and self.active:
+            index, d, phase, s, stop = heapq.heappop(events)
+            asset_class, symbol = datasets[d]
+            strategy = strategies[s]
+            self.portfolio.bar_index = index
+
+            if phase == 0:
+                before = self.portfolio.positions.get(symbol, {}).get(strategy.name)
+                self.check_signal(asset_class, symbol, strategy, index, final_index)
+
+                position = self.portfolio.positions.get(symbol, {}).get(strategy.name)
+                if position and position is not before:
+                    stop_index = self.stop_bar(position, index, finish_index)
+                    if stop_index is not None:
+                        # Sequence number keeps heap entries comparable when the bar, symbol and strategy are equal.
+                        sequence += 1
+                        heapq.heappush(events, (stop_index, d, 1, s, (sequence, position)))
+
+            elif self.portfolio.positions.get(symbol, {}).get(strategy.name) is stop[1]:
+                self.check_stops(asset_class, symbol, strategy, index)
+
+    def run_streams(self, strategies: list, start=None, finish=None) -> None:
+        """
+        Simulate every (symbol, timeframe) dataset in use as a stream of its own bars, merged in order of bar close.
+
+        Each stream holds only real bars (re-indexing padding is skipped), limited to start and finish as for
+        run_bars(). The next bar of every stream is kept in a heap keyed by (close timestamp, stream), so
+        strategies on different timeframes run side by side without synchronising their indexes, e.g. a 1d bar
+        is processed after the 4h bars that close before or with it. Each event costs O(log streams).
+        On each bar the timeframe's strategies are checked for signals, then for triggered stops, as run_bars().
+        """
+
+        by_timeframe = {}
+        for strategy in strategies:
+            by_timeframe.setdefault(strategy.timeframe, []).append(strategy)
+
+        # (asset_class, symbol, timeframe, frame rows of the stream's bars, close timestamp of each bar)
+        streams = []
+        for asset_class in self.portfolio.assets:
+            for symbol in self.portfolio.assets[asset_class]:
+                for timeframe in sorted(by_timeframe):
+                    columns = self.columns[asset_class][symbol][timeframe]
+                    timestamps = columns.timestamps
+                    first = int(timestamps.searchsorted(start)) if start is not None else 0
+                    last = int(timestamps.searchsorted(finish, side="right")) if finish is not None else len(timestamps)
+
+                    rows = columns.rows[(columns.rows >= first) & (columns.rows < last - 1)]
+                    if len(rows) == 0:
+                        continue
+
+                    # Bars close one bar duration after they open. Without a fixed duration, when the next bar opens.
+                    step = TIMEFRAME_NS[timeframe]
+                    if step is None:
+                        closes = np.append(timestamps[rows[1:]], np.iinfo(np.int64).max)
+                    else:
+                        closes = timestamps[rows] + step
+
+                    streams.append((asset_class, symbol, timeframe, rows, closes))
+
+        # One entry per stream: (close timestamp of its next bar, stream, position of the bar in the stream).
+        events = [(int(stream[4][0]), s, 0) for s, stream in enumerate(streams)]
+        heapq.heapify(events)
+
+        while events and self.active:
+            close, s, position = events[0]
+            asset_class, symbol, timeframe, rows, closes = streams[s]
+            index = int(rows[position])
+            self.portfolio.bar_index = index
+
+            for strategy in by_timeframe[timeframe]:
+                self.check_signal(asset_class, symbol, strategy, index, int(rows[-1]))
+
+            for strategy in by_timeframe[timeframe]:
+                self.check_stops(asset_class, symbol, strategy, index)
+
+            if position + 1 < len(rows):
+                heapq.heapreplace(events, (int(closes[position + 1]), s, position + 1))
+            else:
+                heapq.heappop(events)
+
+    def run_partitioned(self, strategies: list, start_index: int, finish_index: int) -> None:
+        """
+        Simulate bars [start_index, finish_index) with the per-symbol work done in parallel, giving the same
+        results as run_bars().
+
+        Datasets are split into one partition per worker process (see parallel.partition_signals()), which
+        finds every strategy's signals and the bar each signal's stop would first trigger on. Those depend only
+        on the symbol's own data. Portfolio-wide state (sizing from equity, allocations, max_simultaneous_positions,
+        correlation limits, drawdown halt) is then applied here by replaying the signals and stops as events in
+        the order run_bars() visits them, as run_events(), so the merge is deterministic.
+        """
+
+        datasets = [(asset_class, symbol) for asset_class in self.portfolio.assets
+                    for symbol in self.portfolio.assets[asset_class]]
+        final_index = finish_index - 1
+
+        # Workers read whole columns, so make sure lazily computed features are there.
+        inputs = []
+        for asset_class, symbol in datasets:
+            columns = self.columns[asset_class][symbol][strategies[0].timeframe]
+            for name in self.graph.aliases:
+                columns.column(name)
+            inputs.append((columns.arrays, columns.timestamps))
+
+        found = partition_signals(strategies, inputs, start_index, finish_index, self.simulation_workers)
+
+        # signals[(d, s)] = {bar: (signal, stop bar)}
+        signals = {}
+        events = []
+        for d in range(len(datasets)):
+            for s in range(len(strategies)):
+                signals[(d, s)] = {bar: (signal, stop) for bar, signal, stop in found[d][s]}
+                bars = list(signals[(d, s)])
+
+                # Every dataset is visited on the final bar to calculate upnl.
+                if final_index >= start_index and (len(bars) == 0 or bars[-1] != final_index):
+                    bars.append(final_index)
+                events.extend((bar, d, 0, s, None) for bar in bars)
+        heapq.heapify(events)
+
+        sequence = 0
+        while events and self.active:
+            index, d, phase, s, stop = heapq.heappop(events)
+            asset_class, symbol = datasets[d]
+            strategy = strategies[s]
+            self.portfolio.bar_index = index
+
+            if phase == 0:
+                signal, stop_index = signals[(d, s)].get(index, (None, None))
+                before = self.portfolio.positions.get(symbol, {}).get(strategy.name)
+                self.apply_signal(asset_class, symbol, strategy, signal, index, final_index)
+
+                position = self.portfolio.positions.get(symbol, {}).get(strategy.name)
+                if position and position is not before and stop_index is not None:
+                    sequence += 1
+                    heapq.heappush(events, (stop_index, d, 1, s, (sequence, position)))
+
+            elif self.portfolio.positions.get(symbol, {}).get(strategy.name) is stop[1]:
+                self.check_stops(asset_class, symbol, strategy, index)
+
+    def run_vectorized(self, strategies: list, start_index: int, finish_index: int) -> None:
+        """
+        Simulate bars [start_index, finish_index) for a single strategy with array operations, for research runs.
+
+        The strategy must have a signal_column and signal from the current bar alone. check_for_signal() is
+        called only on signal bars; positions, stop hits and fills are then derived per dataset with
+        vectorized.position_fills(), and fees, pnl and the trade records with array operations. Sizing depends
+        on equity, so one pass over the opens and closes in bar order (as run_bars() visits them) sizes each
+        position from the realised equity at its entry. Results are written to the portfolio as by the loops.
+
+        Portfolio rules that reject entries (strategy allocation in use, max_simultaneous_positions,
+        correlation limits, drawdown halt) are not applied, so results equal run_bars() only while those rules
+        don't bind, e.g. one symbol per asset class and max_simultaneous_positions above the number of symbols.
+
+        Raises:
+            ValueError if there is more than one strategy or the strategy has no signal_column.
+        """
+
+        if len(strategies) != 1 or getattr(strategies[0], "signal_column", None) is None:
+            raise ValueError("Vectorized simulation supports a single strategy with a signal_column.")
+
+        strategy = strategies[0]
+        portfolio = self.portfolio
+        timeframe = strategy.timeframe
+        final_index = finish_index - 1
+
+        datasets = [(asset_class, symbol) for asset_class in self.portfolio.assets
+                    for symbol in self.portfolio.assets[asset_class]]
+
+        # Positions of each dataset, and (bar, dataset, phase, position) events in the order run_bars() handles
+        # them: phase 0 for signals (open or close), 1 for marking open positions on the final bar, 2 for stops.
+        signals, fills, events = [], [], []
+        for d, (asset_class, symbol) in enumerate(datasets):
+            arrays = self.arrays[asset_class][symbol][timeframe]
+            bars = self.signal_bars(asset_class, symbol, strategy, start_index, finish_index)
+
+            found = [(int(bar), strategy.check_for_signal(self.bar(asset_class, symbol, timeframe, int(bar))))
+                     for bar in bars]
+            found = [(bar, signal) for bar, signal in found if signal]
+            signals.append([signal for bar, signal in found])
+
+            result = position_fills(
+                np.array([bar for bar, signal in found], dtype=np.int64),
+                np.array([signal['direction'] for bar, signal in found], dtype=object),
+                np.array([signal['entry'] for bar, signal in found], dtype=np.float64),
+                np.array([signal['stop'] for bar, signal in found], dtype=np.float64),
+                arrays['Low'], arrays['High'], arrays['Close'], finish_index)
+            fills.append(result)
+
+            for t, (open_bar, close_bar, exit_signal) in enumerate(
+                    zip(result['open_bar'], result['close_bar'], result['exit_signal'])):
+                events.append((int(open_bar), d, 0, t))
+                if close_bar >= 0:
+                    events.append((int(close_bar), d, 0 if exit_signal >= 0 else 2, t))
+                if final_index >= start_index and (close_bar < 0 or (close_bar == final_index and exit_signal < 0)):
+                    events.append((final_index, d, 1, t))
+        events.sort()
+
+        # Open positions are marked at the last real bar's close (see apply_signal()).
+        marks = [self.last_bar(asset_class, symbol, timeframe, final_index) for asset_class, symbol in datasets]
+
+        # Size positions from realised equity at entry. Records (closed trades and marked open positions)
+        # are kept in the order the loop would add them to trade_history.
+        sizes = [np.zeros(len(f['signal'])) for f in fills]
+        records = []
+        current_equity, open_equity = portfolio.current_equity, portfolio.open_equity
+        drawdown_watermark, high_watermark = portfolio.drawdown_watermark, portfolio.high_watermark
+        for bar, d, phase, t in events:
+            asset_class, symbol = datasets[d]
+            signal = signals[d][fills[d]['signal'][t]]
+
+            if phase == 0 and bar == fills[d]['open_bar'][t]:
+                portfolio.current_equity = current_equity
+                sizes[d][t] = portfolio.calculate_position_size({
+                    **signal, 'asset_class': asset_class, 'symbol': symbol, 'timeframe': timeframe,
+                    'strategy': strategy.name})
+                continue
+
+            size = sizes[d][t]
+            fee = portfolio.calculate_fees(size)
+            if phase == 1:
+                exit, fees = self.arrays[asset_class][symbol][timeframe]['Close'][marks[d]], fee
+            else:
+                exit, fees = fills[d]['exit'][t], fee * 2
+            delta, net_pnl = trade_pnl(signal['direction'] == "BUY", signal['entry'], exit, size, fees)
+
+            if phase == 1:
+                open_equity += float(net_pnl)
+                equity = open_equity + current_equity
+            else:
+                current_equity += float(net_pnl)
+                equity = current_equity
+            drawdown_watermark = min(drawdown_watermark, equity)
+            high_watermark = max(high_watermark, equity)
+            records.append((bar, d, phase, t))
+
+        portfolio.current_equity, portfolio.open_equity = current_equity, open_equity
+        portfolio.drawdown_watermark, portfolio.high_watermark = drawdown_watermark, high_watermark
+        portfolio.true_equity = open_equity + current_equity
+
+        # Trade records with array operations.
+        opened = [signals[d][fills[d]['signal'][t]] for bar, d, phase, t in records]
+        marked = np.array([phase == 1 for bar, d, phase, t in records], dtype=bool)
+        buy = np.array([signal['direction'] == "BUY" for signal in opened], dtype=bool)
+        entry = np.array([signal['entry'] for signal in opened], dtype=np.float64)
+        stop = np.array([signal['stop'] for signal in opened], dtype=np.float64)
+        size = np.array([sizes[d][t] for bar, d, phase, t in records], dtype=np.float64)
+        exit = np.array([self.arrays[datasets[d][0]][datasets[d][1]][timeframe]['Close'][marks[d]] if phase == 1
+                         else fills[d]['exit'][t] for bar, d, phase, t in records], dtype=np.float64)
+
+        fee = portfolio.calculate_fees(size)
+        fees = np.where(marked, fee, fee * 2)
+        delta, net_pnl = trade_pnl(buy, entry, exit, size, fees)
+        stop_delta = np.abs((entry - stop) / entry) * 100
+        targets = target_delta(buy, entry, delta, stop_delta, [signal['targets'] for signal in opened], net_pnl,
+                               portfolio.default_target_distance_r)
+
+        winners = net_pnl > 0
+        moved = np.abs((size / 100) * delta)
+        portfolio.gross_profit += float(np.where(winners, moved, 0).sum())
+        portfolio.gross_loss += float(np.where(winners, 0, moved).sum())
+        portfolio.total_fees += float(fees.sum())
+        portfolio.total_winners += int(np.count_nonzero(winners))
+        portfolio.total_losers += int(np.count_nonzero(~winners))
+        portfolio.total_trades += int(np.count_nonzero(~marked))
+
+        timestamps = {d: self.columns[a][s][timeframe].timestamps for d, (a, s) in enumerate(datasets)}
+        for r, (bar, d, phase, t) in enumerate(records):
+            asset_class, symbol = datasets[d]
+            portfolio.trade_history.append({
+                "net_pnl": float(net_pnl[r]),
+                "side": opened[r]['direction'],
+                "entry": float(entry[r]),
+                "exit": float(exit[r]),
+                "delta": float(delta[r]),
+                "stop_delta": float(stop_delta[r]),
+                "target_delta": float(targets[r]),
+                "stop": float(stop[r]),
+                "size": float(size[r]),
+                "fees": float(fees[r]),
+                "strategy": strategy.name,
+                "timeframe": timeframe,
+                "symbol": symbol,
+                "exit_mode": "STOP" if phase == 2 else "SIGNAL",
+                "asset_class": asset_class,
+                "open_timestamp": opened[r]['timestamp'],
+                "close_timestamp": timestamps[d][marks[d] if phase == 1 else bar],
+            })
+
+        # Transaction records and positions left open.
+        for d, (asset_class, symbol) in enumerate(datasets):
+            history = portfolio.transaction_history[symbol][strategy.name]
+            for t, (k, close_bar, exit_signal) in enumerate(
+                    zip(fills[d]['signal'], fills[d]['close_bar'], fills[d]['exit_signal'])):
+                signal = signals[d][k]
+                size = sizes[d][t]
+                history.append({'qty': size, 'price': signal['entry'], 'direction': signal['direction'],
+                                'fees': portfolio.calculate_fees(size), 'timestamp': signal['timestamp']})
+
+                if close_bar >= 0:
+                    history.append({'qty': size, 'price': fills[d]['exit'][t],
+                                    'direction': "SELL" if signal['direction'] == "BUY" else "BUY",
+                                    'fees': portfolio.calculate_fees(size),
+                                    'timestamp': timestamps[d][close_bar]})
+                    portfolio.positions.setdefault(symbol, {})[strategy.name] = None
+                    continue
+
+                portfolio.positions.setdefault(symbol, {})[strategy.name] = {
+                    'entry': signal['entry'], 'stop': signal['stop'], 'targets': signal['targets'], 'size': size,
+                    'fees': portfolio.calculate_fees(size), 'direction': signal['direction'], 'symbol': symbol,
+                    'asset_class': asset_class, 'strategy': strategy.name, 'timeframe': timeframe,
+                    'timestamp': signal['timestamp'], 'upnl': 0, 'r': 0}
+                portfolio.position_count += 1
+                portfolio.open_symbols[symbol] = portfolio.open_symbols.get(symbol, 0) + 1
+                allocation = portfolio.allocations[asset_class]['strategy_allocations'][strategy.name]
+                allocation['in_use'] = allocation['allocation']
+
+        for r, (bar, d, phase, t) in enumerate(records):
+            if phase == 1 and portfolio.positions[datasets[d][1]][strategy.name]:
+                portfolio.positions[datasets[d][1]][strategy.name]['upnl'] = float(net_pnl[r])
 
     def process_signal(self, signal: dict):
 
@@ -212,16 +873,21 @@ class Backtester:
                 # Add logging for non-actionable signals here if required in future.
                 pass
 
-    def start(self, start_timestamp=None, finish_timestamp=None, save=True):
+    def start(self, start_timestamp=None, finish_timestamp=None, save=True, analyse=True):
         """
-        IMPORTANT: For this to work all dataframes must be synchronised by date, i.e have a
-        continuous date index, no missing timestamps, start and finish on same timestamps.
+        Run the simulation, optionally limited to bars between start_timestamp and finish_timestamp (inclusive).
+        Timestamps may be epoch nanoseconds, datetimes or date strings. With analyse False the portfolio's
+        post-simulation analysis (metrics, saving results) is left to the caller. Raises ValueError if no bars
+        of the first asset's dataset fall between the timestamps.
+
+        IMPORTANT: For the bar by bar and event driven loops all dataframes must be synchronised by date,
+        i.e have a continuous date index, no missing timestamps, start and finish on same timestamps.
 
         Limitations/assumptions:
-            - Simulation supports only a single timeframe across all strategies (multiple strategies supported).
-                To extend this to multiple timeframes with the same/similar code, have datasets for all timeframes
-                synchronised on the date index. E.g. If combining 4h and 1d strategies, every sixth 4hr bar you'd
-                process 1 1d bar; the timestamp of every sixth 4h must match the next 1d.
+            - The bar by bar and event driven loops support only a single timeframe across all strategies
+                (multiple strategies supported). Portfolios with strategies on more than one timeframe, or any
+                portfolio with multi_timeframe set, are run by run_streams() which merges every dataset's bars
+                in timestamp order instead.
             - Features requiring analysis of > 1 unit periods must have outputs condensed into a single unit.
                 see EmaCross50200 for example using Cross column.
             - Allocations can be made per asset class, per strategy, but not per asset.
@@ -238,60 +904,66 @@ class Backtester:
         strategies = [s['object'] for s in self.portfolio.strategies.values()]
 
         # Connect to postgres
-        self.db_conn = psycopg2.connect(host="localhost", database="portfolio_sim", user="postgres", password="")
+        if self.use_database:
+            self.db_conn = psycopg2.connect(host="localhost", database="portfolio_sim", user="postgres", password="")
+
+        start = to_epoch(start_timestamp) if start_timestamp is not None else None
+        finish = to_epoch(finish_timestamp) if finish_timestamp is not None else None
 
         # Do pre-processing.
-        self.apply_features_all_datasets(self.data, strategies, self.portfolio.assets_flattened)
+        self.apply_features_all_datasets(self.data, strategies, self.portfolio.assets_flattened, start, finish)
         self.c_matrix = self.correlation_matrix(self.data, self.portfolio.timeframes, self.portfolio.assets_flattened)
 
+        # Rolling correlations between portfolio symbols as of the current bar, looked up by portfolio rules
+        # without any dataframe access. Only needed when the portfolio limits correlated positions.
+        self.correlations = {}
+        if self.portfolio.correlation_threshold < 1:
+            for timeframe in self.portfolio.timeframes:
+                found, closes = self.close_matrix(self.data, timeframe, self.portfolio.assets_flattened)
+                self.correlations[timeframe] = CorrelationIndex.build(
+                    closes, found, self.portfolio.correlation_window)
+        self.portfolio.correlations = self.correlations
+
         # Use first asset's dataset for start/finish indexing.
         asset_class = list(self.portfolio.assets.keys())[0]
         symbol = self.portfolio.assets[asset_class][0]
         timeframe = strategies[0].timeframe
         df = self.data[asset_class][symbol][timeframe]
         rows = df.shape[0]
-        start_index = df.iloc[start_timestamp].name if start_timestamp is not None else 0
-        finish_index = df.iloc[start_timestamp].name if finish_timestamp is not None else rows
-        self.portfolio.finish_date = df.iloc[-1].name
+        start_index = int(df.index.searchsorted(start)) if start is not None else 0
+        finish_index = int(df.index.searchsorted(finish, side="right")) if finish is not None else rows
+        if finish_index <= start_index:
+            raise ValueError(str("No bars of " + symbol + " " + timeframe + " between " + str(start_timestamp)
+                                 + " and " + str(finish_timestamp) + " to simulate."))
+        self.portfolio.finish_date = to_datetime(df.index[finish_index - 1])
+
+        # Lazy features need only cover the simulated bars, plus warm-up. Each timeframe has its own index.
+        if not self.full_history_features:
+            for asset_class in self.columns:
+                for symbol in self.columns[asset_class]:
+                    for columns in self.columns[asset_class][symbol].values():
+                        first = int(columns.timestamps.searchsorted(start)) if start is not None else 0
+                        last = int(columns.timestamps.searchsorted(finish, side="right")) if finish is not None \
+                            else len(columns.timestamps)
+                        columns.set_window(first, last)
+
+        # Cross-sectional features need every symbol's input, so follow the window set up above.
+        self.apply_cross_sectional_features(self.data, self.portfolio.assets_flattened)
 
         # print(self.portfolio.parameter_summary())
         print(f"Running simulation for {self.portfolio.name}...")
 
-        # Iterate dataframes timestamp by timestamp.
-        for index in range(start_index, finish_index - 1):
-            if self.active:
-                for asset_class in self.portfolio.assets:
-                    for symbol in self.portfolio.assets[asset_class]:
-
-                        # Positions can be opened/closed/modified two ways:
-                        # 1. Directly with a buy/sell signal, as derived from feature data during pre-processing
-                        for strategy in strategies:
-                            signal = strategy.check_for_signal(
-                                self.data[asset_class][symbol][strategy.timeframe].iloc[index])
-                            if signal:
-                                signal['asset_class'] = asset_class
-                                signal['symbol'] = symbol
-                                signal['timeframe'] = strategy.timeframe
-                                signal['strategy'] = strategy.name
-                                signal['mode'] = "SIGNAL"
-                                self.process_signal(signal)
-
-                            # Calculate upnl for open positions based on final bar close price.
-                            if index == finish_index - 2:
-                                close = self.data[asset_class][symbol][strategy.timeframe].iloc[index]['Close']
-                                timestamp = self.data[asset_class][symbol][strategy.timeframe].iloc[index].name
-                                self.portfolio.calculate_open_equity_for_position(
-                                    asset_class, symbol, strategy, close, timestamp)
+        if self.vectorized:
+            self.run_vectorized(strategies, start_index, finish_index - 1)
+        elif self.multi_timeframe or len(self.portfolio.timeframes) > 1:
+            self.run_streams(strategies, start, finish)
+        elif self.simulation_workers:
+            self.run_partitioned(strategies, start_index, finish_index - 1)
+        elif self.event_driven:
+            self.run_events(strategies, start_index, finish_index - 1)
+        else:
+            self.run_bars(strategies, start_index, finish_index - 1)
 
-                        # 2. If price movement triggers a resting order.
-                        signal = self.portfolio.update_price(
-                            self.data[asset_class][symbol][strategy.timeframe].iloc[index], strategy.name)
-                        if signal:
-                            signal['asset_class'] = asset_class
-                            signal['symbol'] = symbol
-                            signal['timeframe'] = strategy.timeframe
-                            signal['strategy'] = strategy.name
-                            self.process_signal(signal)
         # TODO:
         # Auto update data on start.
         # Modify portfolio to get p_win values from DB for kelly sizing.
@@ -299,5 +971,6 @@ class Backtester:
         # Restructure portfolio to use an parent abstract class for static methods.
         # Add equity curve display option.
 
-        self.portfolio.post_simulation_analysis(save, self.db_conn, DB_TABLES)
+        if analyse:
+            self.portfolio.post_simulation_analysis(save, self.db_conn, DB_TABLES)
         print("Simulation complete.\n")
@@ -0,0 +1,171 @@
+from timeit import repeat
+import pandas as pd
+import numpy as np
+
+import indicators
+
+
+# Micro-benchmark of the NumPy indicator kernels against the DataFrame based versions in data/features.py.
+# The pandas versions are repeated here as data/features.py fetches market data when imported. Wilder ATR and
+# RSI are seeded with the mean of the first period values on both sides.
+#
+# speedup is pandas time / NumPy time, below 1 where pandas is faster. The kernels avoid DataFrame overhead,
+# which dominates on short inputs; on long inputs pandas' compiled loops are as fast or faster (e.g. rolling
+# std, Bollinger bands, z-score and RSI at 1M bars), and EMA, ATR and Wilder smoothing call pandas anyway.
+#
+# max_error is the largest relative difference between the two versions' outputs. pandas' rolling kernels
+# update their sums bar by bar, so their own rounding error (around 1e-6 for rolling std over 1M bars) is
+# included in it.
+#
+# Usage: python benchmarks.py
+
+
+BARS = [1000, 10000, 100000, 1000000]
+REPEATS = 5
+
+
+def pandas_sma(data: pd.DataFrame, period=10) -> pd.Series:
+    return data['Close'].rolling(period).mean()
+
+
+def pandas_ema(data: pd.DataFrame, period=10) -> pd.Series:
+    return data['Close'].ewm(span=period, adjust=False).mean()
+
+
+def pandas_atr(data: pd.DataFrame, period=14) -> pd.Series:
+    diff_high_low = data['High'] - data['Low']
+    diff_high_close = np.abs(data['High'] - data['Close'].shift())
+    diff_low_close = np.abs(data['Low'] - data['Close'].shift())
+
+    ranges = pd.concat([diff_high_low, diff_high_close, diff_low_close], axis=1)
+    true_range = np.max(ranges, axis=1)
+
+    return true_range.rolling(period).sum() / period
+
+
+def pandas_wilder_smooth(series: pd.Series, period=14) -> pd.Series:
+    # Wilder's definition: seeded with the mean of the first period values, as indicators.wilder_smooth().
+    first = series.index.get_loc(series.first_valid_index())
+    seed = first + period - 1
+
+    seeded = series.copy()
+    seeded.iloc[:seed] = np.nan
+    seeded.iloc[seed] = series.iloc[first:seed + 1].mean()
+
+    return seeded.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def pandas_wilder_atr(data: pd.DataFrame, period=14) -> pd.Series:
+    diff_high_low = data['High'] - data['Low']
+    diff_high_close = np.abs(data['High'] - data['Close'].shift())
+    diff_low_close = np.abs(data['Low'] - data['Close'].shift())
+
+    true_range = pd.concat([diff_high_low, diff_high_close, diff_low_close], axis=1).max(axis=1)
+
+    return pandas_wilder_smooth(true_range, period)
+
+
+def pandas_bollinger(data: pd.DataFrame, period=20, num_std=2) -> [pd.Series]:
+    middle = data['Close'].rolling(period).mean()
+    std = data['Close'].rolling(period).std(ddof=0)
+
+    return [middle, middle + num_std * std, middle - num_std * std]
+
+
+def pandas_rsi(data: pd.DataFrame, period=14) -> pd.Series:
+    delta = data['Close'].diff()
+    gain = pandas_wilder_smooth(delta.clip(lower=0), period)
+    loss = pandas_wilder_smooth(-delta.clip(upper=0), period)
+
+    return 100 - 100 / (1 + gain / loss)
+
+
+def pandas_std(data: pd.DataFrame, period=20) -> pd.Series:
+    return data['Close'].rolling(period).std()
+
+
+def pandas_zscore(data: pd.DataFrame, period=20) -> pd.Series:
+    mean = data['Close'].rolling(period).mean()
+    std = data['Close'].rolling(period).std(ddof=0)
+
+    return (data['Close'] - mean) / std
+
+
+def random_ohlc(bars: int, seed=0) -> pd.DataFrame:
+    """
+    Random walk OHLC data with a valid high/low range.
+    """
+
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+
+    return pd.DataFrame({
+        'Open': np.roll(close, 1),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close})
+
+
+def max_error(expected, actual) -> float:
+    """
+    Largest relative difference between two outputs (arrays, Series or lists of them), over the bars where
+    both have a value.
+    """
+
+    if isinstance(expected, (list, tuple)):
+        return max(max_error(e, a) for e, a in zip(expected, actual))
+
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    both = ~np.isnan(expected) & ~np.isnan(actual) & (expected != 0)
+    if not both.any():
+        return 0.0
+
+    return float(np.max(np.abs(actual[both] - expected[both]) / np.abs(expected[both])))
+
+
+def best_time(function) -> float:
+    """
+    Best of REPEATS runs, in milliseconds.
+    """
+
+    number = 10
+    return min(repeat(function, number=number, repeat=REPEATS)) / number * 1000
+
+
+def run() -> pd.DataFrame:
+
+    rows = []
+    for bars in BARS:
+        data = random_ohlc(bars)
+        high, low, close = data['High'].to_numpy(), data['Low'].to_numpy(), data['Close'].to_numpy()
+
+        # (indicator, pandas version, numpy version)
+        cases = [
+            ("SMA", lambda: pandas_sma(data, 20), lambda: indicators.rolling_mean(close, 20)),
+            ("EMA", lambda: pandas_ema(data, 20), lambda: indicators.ema(close, 20)),
+            ("ATR", lambda: pandas_atr(data, 14), lambda: indicators.atr(high, low, close, 14)),
+            ("Wilder ATR", lambda: pandas_wilder_atr(data, 14), lambda: indicators.wilder_atr(high, low, close, 14)),
+            ("Bollinger", lambda: pandas_bollinger(data, 20), lambda: indicators.bollinger_bands(close, 20)),
+            ("RSI", lambda: pandas_rsi(data, 14), lambda: indicators.rsi(close, 14)),
+            ("Rolling std", lambda: pandas_std(data, 20), lambda: indicators.rolling_std(close, 20)),
+            ("Z-score", lambda: pandas_zscore(data, 20), lambda: indicators.zscore(close, 20))]
+
+        for name, pandas_version, numpy_version in cases:
+            pandas_ms = best_time(pandas_version)
+            numpy_ms = best_time(numpy_version)
+            rows.append({
+                'indicator': name,
+                'bars': bars,
+                'pandas_ms': round(pandas_ms, 3),
+                'numpy_ms': round(numpy_ms, 3),
+                'speedup': round(pandas_ms / numpy_ms, 2),
+                'max_error': float(f"{max_error(pandas_version(), numpy_version()):.2g}")})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    pd.set_option('display.width', None)
+    print(run().to_string(index=False))
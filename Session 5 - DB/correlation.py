@@ -0,0 +1,265 @@
+import numpy as np
+
+
+CHUNK_ROWS = 65536      # rows per block when accumulating sums over long histories
+
+
+def _correlation_from_sums(count, sum_x, sum_xx, sum_xy, min_periods: int) -> np.ndarray:
+    """
+    N x N Pearson correlations from pairwise-complete sums, NaN where fewer than min_periods shared
+    observations or zero variance. For pair (i, j) count[i, j] is the number of rows where both have
+    values, sum_x[i, j] / sum_xx[i, j] the sum / sum of squares of series i over those rows, and
+    sum_xy[i, j] the sum of products.
+    """
+
+    n = count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var = sum_xx - sum_x * sum_x / n
+        denominator = np.sqrt(var * var.T)
+        result = np.clip(cov / denominator, -1.0, 1.0)
+
+    result[(n < min_periods) | ~(denominator > 0)] = np.nan
+    return result
+
+
+def pairwise_correlation(values: np.ndarray, min_periods=1) -> np.ndarray:
+    """
+    Pearson correlation matrix between the columns of values, using for each pair only the rows where
+    both have values (pairwise-complete observations), as pandas DataFrame.corr().
+
+    Sums are accumulated in blocks of CHUNK_ROWS rows, so temporary memory does not grow with history length.
+
+    Args:
+        values: (bars x series) array, NaN where missing.
+        min_periods: minimum shared observations for a pair, NaN otherwise.
+
+    Returns:
+        (series x series) array.
+
+    Raises:
+        None.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[1]
+
+    # Centre each series on its first value to reduce cancellation in the sums.
+    shift = np.zeros(n)
+    if values.shape[0] > 0:
+        valid = ~np.isnan(values)
+        shift = values[np.argmax(valid, axis=0), np.arange(n)]
+        shift[~valid.any(axis=0)] = 0.0
+
+    count, sum_x, sum_xx, sum_xy = (np.zeros((n, n)) for i in range(4))
+    for row in range(0, values.shape[0], CHUNK_ROWS):
+        chunk = values[row:row + CHUNK_ROWS]
+        mask = ~np.isnan(chunk)
+        m = mask.astype(np.float64)
+        x = np.where(mask, chunk - shift, 0.0)
+
+        count += m.T @ m
+        sum_x += x.T @ m
+        sum_xx += (x * x).T @ m
+        sum_xy += x.T @ x
+
+    return _correlation_from_sums(count, sum_x, sum_xx, sum_xy, max(min_periods, 1))
+
+
+class RollingCorrelation:
+    """
+    Windowed Pearson correlation between a set of series, updated incrementally one bar at a time.
+
+    Keeps a ring buffer of the last `window` rows plus four N x N running sums, so memory is
+    O(window * N + N^2) regardless of history length. Adding a bar (and dropping the oldest) costs O(N^2)
+    vectorized operations, and the correlation of any pair as of the latest bar is O(1).
+
+    Missing values (NaN) are handled pairwise: each pair uses the rows where both series have values.
+    Sums are rebuilt from the buffer every `window` updates to bound floating point drift.
+    """
+
+    def __init__(self, symbols: list, window=90, min_periods=None):
+        self.symbols = list(symbols)
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+        self.window = window
+        self.min_periods = min_periods if min_periods is not None else max(window // 3, 2)
+
+        n = len(self.symbols)
+        self.buffer = np.full((window, n), np.nan)
+        self.position = 0           # next buffer row to write
+        self.updates = 0
+        self.shift = np.zeros(n)    # per-series offset subtracted before summing, reduces cancellation
+
+        # Pairwise-complete sums over the window. For pair (i, j):
+        #   count[i, j]: rows where both i and j have values
+        #   sum_x[i, j]: sum of series i over those rows (sum_x[j, i] is the sum of series j)
+        #   sum_xx[i, j]: sum of series i squared over those rows
+        #   sum_xy[i, j]: sum of series i * series j
+        self.count = np.zeros((n, n))
+        self.sum_x = np.zeros((n, n))
+        self.sum_xx = np.zeros((n, n))
+        self.sum_xy = np.zeros((n, n))
+
+    def _accumulate(self, row: np.ndarray, sign: float) -> None:
+        mask = ~np.isnan(row)
+        if not mask.any():
+            return
+
+        x = np.where(mask, row - self.shift, 0.0)
+        m = mask.astype(np.float64)
+
+        self.count += sign * np.outer(m, m)
+        self.sum_x += sign * np.outer(x, m)
+        self.sum_xx += sign * np.outer(x * x, m)
+        self.sum_xy += sign * np.outer(x, x)
+
+    def _rebuild(self) -> None:
+        """
+        Recompute sums from the buffer, re-centring each series on its window mean.
+        """
+
+        filled = self.buffer if self.updates >= self.window else self.buffer[:self.updates]
+        with np.errstate(invalid="ignore"):
+            means = np.nanmean(filled, axis=0) if filled.shape[0] > 0 else self.shift
+        self.shift = np.where(np.isnan(means), 0.0, means)
+
+        mask = ~np.isnan(filled)
+        m = mask.astype(np.float64)
+        x = np.where(mask, filled - self.shift, 0.0)
+
+        self.count = m.T @ m
+        self.sum_x = x.T @ m
+        self.sum_xx = (x * x).T @ m
+        self.sum_xy = x.T @ x
+
+    def load(self, rows) -> None:
+        """
+        Replace the window with the last `window` of rows (bars x symbols, oldest first), as if only those
+        rows had been added with update(). One vectorized rebuild instead of a Python loop of updates.
+        """
+
+        rows = np.asarray(rows, dtype=np.float64)[-self.window:]
+        count = rows.shape[0]
+
+        self.buffer[:] = np.nan
+        self.buffer[:count] = rows
+        self.position = count % self.window
+        self.updates = count
+        self._rebuild()
+
+    def update(self, row) -> None:
+        """
+        Add one bar of values (one per symbol, in self.symbols order; NaN where missing),
+        dropping the oldest bar once the window is full.
+        """
+
+        row = np.asarray(row, dtype=np.float64)
+
+        if self.updates >= self.window:
+            self._accumulate(self.buffer[self.position], -1.0)
+
+        self.buffer[self.position] = row
+        self._accumulate(row, 1.0)
+
+        self.position = (self.position + 1) % self.window
+        self.updates += 1
+
+        if self.updates % self.window == 0:
+            self._rebuild()
+
+    def correlation(self, a: str, b: str) -> float:
+        """
+        Correlation of symbols a and b over the current window, NaN if too few shared observations.
+        """
+
+        i, j = self.columns[a], self.columns[b]
+        n = self.count[i, j]
+        if n < self.min_periods:
+            return np.nan
+
+        sx, sy = self.sum_x[i, j], self.sum_x[j, i]
+        cov = self.sum_xy[i, j] - sx * sy / n
+        var_x = self.sum_xx[i, j] - sx * sx / n
+        var_y = self.sum_xx[j, i] - sy * sy / n
+        if var_x <= 0 or var_y <= 0:
+            return np.nan
+
+        return float(np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0))
+
+    def matrix(self) -> np.ndarray:
+        """
+        N x N correlation matrix over the current window, NaN where too few shared observations.
+        """
+
+        return _correlation_from_sums(self.count, self.sum_x, self.sum_xx, self.sum_xy, self.min_periods)
+
+
+class CorrelationIndex:
+    """
+    Per-bar rolling correlation lookup over a (bars x symbols) matrix of values, e.g. closes.
+
+    Correlations as of bar t are over the `window` rows up to and including t, kept by a RollingCorrelation that
+    is advanced to the looked-up bar. Lookups during a backtest move forward through the history, so each bar
+    costs one O(N^2) update and a lookup is O(1) per pair; looking up an earlier bar, or one more than a window
+    ahead, reloads the window instead. Memory is the matrix (bars * N * 8 bytes) plus the engine's window.
+    """
+
+    def __init__(self, symbols: list, matrix: np.ndarray, window=90, min_periods=None):
+        self.symbols = list(symbols)
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+        self.matrix = matrix
+        self.window = window
+        self.min_periods = min_periods if min_periods is not None else max(window // 3, 2)
+
+        self.engine = RollingCorrelation(self.symbols, window, self.min_periods)
+        self.bar = -1       # last row of matrix added to the engine
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, symbols: list, window=90, min_periods=None):
+        """
+        Args:
+            matrix: (bars x symbols) array of values to correlate, NaN where missing.
+            symbols: symbol for each column of matrix.
+            window: rolling window length in bars.
+            min_periods: minimum shared observations for a pair, see RollingCorrelation.
+
+        Returns:
+            CorrelationIndex.
+
+        Raises:
+            ValueError if the number of symbols does not match the columns of matrix.
+        """
+
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.ndim != 2 or matrix.shape[1] != len(symbols):
+            raise ValueError(str("Expected " + str(len(symbols)) + " columns, got matrix of shape "
+                                 + str(matrix.shape) + "."))
+
+        return cls(symbols, matrix, window, min_periods)
+
+    def advance(self, bar: int) -> None:
+        """
+        Bring the engine's window to the rows up to and including bar.
+        """
+
+        bar = min(bar, self.matrix.shape[0] - 1)
+        if bar < self.bar or bar - self.bar > self.window:
+            self.engine.load(self.matrix[max(bar - self.window + 1, 0):bar + 1])
+        else:
+            for row in range(self.bar + 1, bar + 1):
+                self.engine.update(self.matrix[row])
+
+        self.bar = bar
+
+    def correlations(self, bar: int, symbol: str, others) -> dict:
+        """
+        Correlations of symbol with each of others as of bar, skipping symbols not in the index.
+        O(len(others)) once the engine is at bar.
+        """
+
+        self.advance(bar)
+        return {other: self.engine.correlation(symbol, other) for other in others if other in self.columns}
+
+    def correlation(self, bar: int, a: str, b: str) -> float:
+        self.advance(bar)
+        return self.engine.correlation(a, b)
@@ -0,0 +1,125 @@
+from time import perf_counter
+import pandas as pd
+import numpy as np
+
+from portfolios import TestPortfolio
+from backtest import Backtester, SYMBOLS
+
+
+# Cross-check of the vectorized (Backtester.run_vectorized()) and partitioned (Backtester.run_partitioned())
+# simulations against the bar by bar and event driven loops on the same datasets and settings, with the time
+# each takes to simulate (pre-processing excluded).
+# Vectorized runs don't apply portfolio rules that reject entries, so the fixture portfolio holds one symbol
+# per asset class and allows more open positions than it has symbols.
+#
+# Requires the same data as test_runner.py. Data is loaded once and shared by every run, and results are not
+# saved, so no database is needed.
+#
+# Usage: python engine_check.py
+
+
+ENGINES = {
+    'bars': {},
+    'events': {'event_driven': True},
+    'partitioned': {'simulation_workers': 2},
+    'vectorized': {'vectorized': True}}
+
+
+class TimedBacktester(Backtester):
+
+    def __init__(self, portfolio, **kwargs):
+        super().__init__(portfolio, **kwargs)
+        self.simulation_ms = None
+
+    def timed(self, run, *args) -> None:
+        start = perf_counter()
+        run(*args)
+        self.simulation_ms = (perf_counter() - start) * 1000
+
+    def run_bars(self, *args) -> None:
+        self.timed(super().run_bars, *args)
+
+    def run_events(self, *args) -> None:
+        self.timed(super().run_events, *args)
+
+    def run_partitioned(self, *args) -> None:
+        self.timed(super().run_partitioned, *args)
+
+    def run_vectorized(self, *args) -> None:
+        self.timed(super().run_vectorized, *args)
+
+
+def fixture_portfolio() -> TestPortfolio:
+    """
+    TestPortfolio limited to the first symbol of each asset class, with no cap on open positions.
+    """
+
+    portfolio = TestPortfolio()
+    portfolio.assets = {asset_class: symbols[:1] for asset_class, symbols in portfolio.assets.items()}
+    portfolio.assets_flattened = [i for j in portfolio.assets.values() for i in j]
+    portfolio.max_simultaneous_positions = len(portfolio.assets_flattened) + 1
+
+    return portfolio
+
+
+def mismatches(expected: TestPortfolio, actual: TestPortfolio) -> list:
+    """
+    Descriptions of differences between the trade and transaction records and equity of two simulated portfolios.
+    """
+
+    found = []
+    if len(expected.trade_history) != len(actual.trade_history):
+        found.append(f"{len(actual.trade_history)} trades, {len(expected.trade_history)} expected")
+
+    for number, (a, b) in enumerate(zip(expected.trade_history, actual.trade_history)):
+        fields = [key for key in a if key not in ('r', 'hold_time') and a[key] != b.get(key)]
+        if fields:
+            found.append(f"trade {number} ({a['symbol']}): {fields}")
+
+    for symbol, records in expected.transaction_history.items():
+        if records != actual.transaction_history[symbol]:
+            found.append(f"transactions of {symbol}")
+
+    for attribute in ('current_equity', 'open_equity', 'high_watermark', 'drawdown_watermark', 'position_count',
+                      'total_trades'):
+        if getattr(expected, attribute) != getattr(actual, attribute):
+            found.append(attribute)
+
+    # Running totals are summed in one call by run_vectorized(), so may differ in the last bits.
+    for attribute in ('total_fees', 'gross_profit', 'gross_loss'):
+        if not np.isclose(getattr(expected, attribute), getattr(actual, attribute), rtol=1e-12, atol=0):
+            found.append(attribute)
+
+    return found
+
+
+def run() -> pd.DataFrame:
+
+    data = Backtester.load_local_data(SYMBOLS)
+
+    rows = []
+    results = {}
+    for engine, kwargs in ENGINES.items():
+        bt = TimedBacktester(fixture_portfolio(), data=data, use_database=False, **kwargs)
+        bt.start(save=False)
+        results[engine] = bt.portfolio
+
+        problems = mismatches(results['bars'], bt.portfolio)
+        for problem in problems:
+            print(f"{engine}: {problem}")
+
+        rows.append({
+            'engine': engine,
+            'trades': len(bt.portfolio.trade_history),
+            'realised_equity': round(bt.portfolio.current_equity, 2),
+            'open_equity': round(bt.portfolio.open_equity, 2),
+            'simulation_ms': round(bt.simulation_ms, 3),
+            'speedup': round(rows[0]['simulation_ms'] / bt.simulation_ms, 2) if rows else 1.0,
+            'matches_bars': len(problems) == 0})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    pd.set_option('display.width', None)
+    print(run().to_string(index=False))
@@ -0,0 +1,169 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import inspect
+import tempfile
+import json
+import os
+
+
+CACHE_DIR = "./cache/features/"
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2     # Oldest entries are evicted once the cache exceeds this size.
+
+# Columns that identify a dataset's content. Derived feature columns are not part of the hash.
+BASE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Suffix used to mark object (label) arrays, which are stored as fixed width strings to avoid pickling.
+LABEL_SUFFIX = "__labels"
+
+# Suffix of entries being written. Each save writes its own temporary file, so processes saving the same key
+# at the same time don't write to (or replace) each other's file. Temporary files are not entries.
+TEMP_SUFFIX = ".tmp"
+
+
+def dataset_hash(df: pd.DataFrame) -> str:
+    """
+    Return a content hash of the dataset's index and base OHLCV columns.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(df.index.values).tobytes())
+    for column in BASE_COLUMNS:
+        if column in df.columns:
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64)).tobytes())
+
+    return digest.hexdigest()
+
+
+def code_version(*objects) -> str:
+    """
+    Return a hash of the source code of the given functions, classes or modules, so cached
+    values are invalidated when the code that produced them changes.
+    """
+
+    digest = hashlib.blake2b(digest_size=8)
+    for obj in objects:
+        try:
+            digest.update(inspect.getsource(obj).encode())
+        except (OSError, TypeError):
+            digest.update(getattr(obj, "__qualname__", repr(obj)).encode())
+
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    On-disk cache of computed feature arrays.
+
+    Entries are keyed on (dataset content hash, feature name, parameters, code version) and stored
+    as uncompressed .npz files. When the total size exceeds max_bytes the least recently used
+    entries are deleted.
+    """
+
+    def __init__(self, path=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    def key(self, data_hash: str, name: str, params: dict, version: str) -> str:
+        """
+        Return the cache key for a feature computed from a dataset.
+        """
+        identity = json.dumps([data_hash, name, sorted(params.items()), version], default=str)
+        return hashlib.blake2b(identity.encode(), digest_size=20).hexdigest()
+
+    def load(self, key: str) -> dict:
+        """
+        Return dict of name: array for the given key, or None if not cached.
+        """
+
+        filename = os.path.join(self.path, key + ".npz")
+        try:
+            with np.load(filename, allow_pickle=False) as file:
+                arrays = {}
+                for name in file.files:
+                    if name.endswith(LABEL_SUFFIX):
+                        labels = file[name].astype(object)
+                        labels[labels == ""] = None
+                        arrays[name[:-len(LABEL_SUFFIX)]] = labels
+                    else:
+                        arrays[name] = file[name]
+
+            # Touch the entry so eviction is least recently used.
+            os.utime(filename)
+
+        except (OSError, ValueError):
+            # Missing (or evicted by another process while being read) or unreadable entries are misses.
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return arrays
+
+    def save(self, key: str, arrays: dict) -> None:
+        """
+        Store dict of name: array under the given key, then evict old entries if over the size limit.
+        """
+
+        to_save = {}
+        for name, values in arrays.items():
+            values = np.asarray(values)
+            if values.dtype == object:
+                to_save[name + LABEL_SUFFIX] = np.where(pd.isnull(values), "", values).astype(str)
+            else:
+                to_save[name] = values
+
+        # Write to a temporary file first so a partially written entry is never read.
+        filename = os.path.join(self.path, key + ".npz")
+        descriptor, temp_filename = tempfile.mkstemp(dir=self.path, prefix=key + ".", suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                np.savez(file, **to_save)
+            os.replace(temp_filename, filename)
+        except BaseException:
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Delete least recently used entries until the cache is within max_bytes.
+        """
+
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.path, filename))
+                except FileNotFoundError:
+                    # Removed by another process since listed.
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(entry[1] for entry in entries)
+        for mtime, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        for filename in os.listdir(self.path):
+            if filename.endswith(".npz"):
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except FileNotFoundError:
+                    pass
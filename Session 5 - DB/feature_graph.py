@@ -0,0 +1,244 @@
+import inspect
+
+from feature_cache import code_version
+from matrix import stack_columns, unstack_columns
+
+
+class Feature:
+    """
+    A named feature node: function(*inputs, **params).
+
+    Inputs are either base column names of the dataset ("Open", "High", "Low", "Close", "Volume")
+    or other Feature nodes. Functions take and return arrays with time along axis 0.
+
+    lookback is the number of bars of input before a bar needed for the output at that bar to be valid,
+    e.g. period - 1 for a moving average. warmup adds the warm-up of the inputs, i.e. it is the number of
+    source bars a computation must start before the first bar it is used for.
+
+    e.g.
+        fast = Feature("10EMA", ema, ["Close"], lookback=40, span=10)
+        slow = Feature("20EMA", ema, ["Close"], lookback=80, span=20)
+        cross = Feature("Cross", cross_signal, [fast, slow], lookback=1)
+    """
+
+    def __init__(self, name: str, function, inputs: list, lookback=0, **params):
+        self.name = name
+        self.function = function
+        self.inputs = inputs
+        self.params = params
+        self.lookback = lookback
+        self.warmup = lookback + max([i.warmup for i in inputs if isinstance(i, Feature)], default=0)
+
+        # Nodes with equal signatures produce identical values, regardless of their names.
+        input_signatures = [i.signature if isinstance(i, Feature) else repr(i) for i in inputs]
+        param_signature = ", ".join(f"{k}={v!r}" for k, v in sorted(params.items()))
+        self.signature = f"{function.__module__}.{function.__qualname__}({', '.join(input_signatures)}; {param_signature})"
+
+    def __repr__(self):
+        return f"Feature({self.name}: {self.signature})"
+
+
+class CrossSectionalFeature:
+    """
+    A feature computed across every symbol of a timeframe at each bar: function(matrix, **params).
+
+    The input (a base column name or a Feature node) of every portfolio symbol is aligned on timestamp into a
+    (bars x symbols) matrix, NaN where a symbol has no bar or value or its market is closed (zero close). The function returns a matrix
+    of the same shape and each symbol's column is added to its dataset under name, so strategies read it from
+    their row like any other feature.
+
+    e.g.
+        momentum = Feature("ROC20", rate_of_change, ["Close"], lookback=20, period=20)
+        cross_features = [CrossSectionalFeature("ROC20Rank", cross_percentile, momentum)]
+    """
+
+    def __init__(self, name: str, function, input, **params):
+        self.name = name
+        self.function = function
+        self.input = input
+        self.params = params
+
+    def __repr__(self):
+        return f"CrossSectionalFeature({self.name}: {self.function.__qualname__}({self.input!r}))"
+
+
+class FeatureGraph:
+    """
+    Dependency graph of the features declared by a set of strategies.
+
+    Each strategy lists the Feature nodes it needs in its "features" attribute. Nodes shared between
+    strategies (equal signatures) are merged so each is computed once per dataset, in topological order.
+    CrossSectionalFeatures listed in a strategy's "cross_features" attribute are collected in cross_sectional,
+    and their Feature inputs added to the graph.
+    """
+
+    def __init__(self, strategies: list):
+        self.nodes = []         # unique nodes in topological order
+        self.aliases = {}       # output column name: node signature
+        self.declared = 0       # features listed by strategies, including duplicates
+        self.cross_sectional = {}   # name: CrossSectionalFeature
+
+        by_signature = {}
+        for strategy in strategies:
+            for feature in getattr(strategy, "features", []):
+                self.declared += 1
+                self._add(feature, by_signature, [])
+
+            for feature in getattr(strategy, "cross_features", []):
+                self.declared += 1
+                if isinstance(feature.input, Feature):
+                    self._add(feature.input, by_signature, [])
+                if feature.name in self.aliases or self.cross_sectional.get(feature.name, feature) is not feature:
+                    raise ValueError(str("Feature name " + feature.name + " is declared with different definitions."))
+                self.cross_sectional[feature.name] = feature
+
+        # Base dataset columns read by any node.
+        self.inputs = sorted({i for node in self.nodes for i in node.inputs if not isinstance(i, Feature)})
+
+        self.versions = {node.signature: code_version(node.function, inspect.getmodule(node.function))
+                         for node in self.nodes}
+
+    def _add(self, feature: Feature, by_signature: dict, path: list) -> None:
+        """
+        Depth-first insert of a node and its dependencies, so dependencies always precede dependants.
+        """
+
+        if feature.signature in path:
+            raise ValueError(str("Feature " + feature.name + " depends on itself."))
+
+        for dependency in feature.inputs:
+            if isinstance(dependency, Feature):
+                self._add(dependency, by_signature, path + [feature.signature])
+
+        if feature.signature not in by_signature:
+            by_signature[feature.signature] = feature
+            self.nodes.append(feature)
+
+        if self.aliases.get(feature.name, feature.signature) != feature.signature:
+            raise ValueError(str("Feature name " + feature.name + " is declared with different definitions."))
+        self.aliases[feature.name] = feature.signature
+
+    def required(self, names: list) -> list:
+        """
+        Return the nodes needed to compute the given feature names, in topological order.
+        """
+
+        needed = {self.aliases[name] for name in names}
+        for node in reversed(self.nodes):
+            if node.signature in needed:
+                needed.update(i.signature for i in node.inputs if isinstance(i, Feature))
+
+        return [node for node in self.nodes if node.signature in needed]
+
+    def warmup(self, names=None) -> int:
+        """
+        Return the number of warm-up bars needed to compute the given feature names (default all).
+        """
+
+        nodes = self.nodes if names is None else self.required(names)
+        return max([node.warmup for node in nodes], default=0)
+
+    def evaluate(self, columns: dict, cache=None, data_hash=None) -> dict:
+        """
+        Compute every node once for a dataset.
+
+        Args:
+            columns: dict of base column name: array.
+            cache: optional FeatureCache, each node is loaded from/saved to the cache individually.
+            data_hash: content hash of the dataset, required when using a cache.
+
+        Returns:
+            Dict of feature name: array, for every declared name (aliases of the same node share one array).
+
+        Raises:
+            None.
+        """
+
+        values = {}
+        for node in self.nodes:
+
+            key = None
+            if cache is not None and data_hash is not None:
+                key = cache.key(data_hash, node.signature, node.params, self.versions[node.signature])
+                cached = cache.load(key)
+                if cached is not None:
+                    values[node.signature] = cached['values']
+                    continue
+
+            args = [values[i.signature] if isinstance(i, Feature) else columns[i] for i in node.inputs]
+            values[node.signature] = node.function(*args, **node.params)
+
+            if key is not None:
+                cache.save(key, {'values': values[node.signature]})
+
+        return {name: values[signature] for name, signature in self.aliases.items()}
+
+    def evaluate_many(self, datasets: list, cache=None, data_hashes=None) -> list:
+        """
+        Compute every node once for a group of datasets, using 2D (bars x datasets) arrays.
+
+        Base columns of all datasets are stacked into one matrix per column (see matrix.stack_columns()),
+        so each node is a single vectorized call for every dataset at once rather than one call per dataset.
+        Datasets whose features are all cached are loaded instead of computed.
+
+        Args:
+            datasets: list of dicts of base column name: array, one per dataset.
+            cache: optional FeatureCache.
+            data_hashes: list of dataset content hashes, required when using a cache.
+
+        Returns:
+            List of dicts of feature name: array, one per dataset.
+
+        Raises:
+            None.
+        """
+
+        results = [None] * len(datasets)
+        if cache is not None and data_hashes is not None:
+            results = [self.load(cache, data_hash) for data_hash in data_hashes]
+
+        pending = [position for position, result in enumerate(results) if result is None]
+        if len(pending) > 0:
+            lengths = [len(datasets[position][self.inputs[0]]) for position in pending] if self.inputs else [0] * len(pending)
+            columns = {column: stack_columns([datasets[position][column] for position in pending]) for column in self.inputs}
+
+            values = {}
+            for node in self.nodes:
+                args = [values[i.signature] if isinstance(i, Feature) else columns[i] for i in node.inputs]
+                values[node.signature] = node.function(*args, **node.params)
+
+            unstacked = {signature: unstack_columns(matrix, lengths) for signature, matrix in values.items()}
+            for column, position in enumerate(pending):
+                results[position] = {name: unstacked[signature][column] for name, signature in self.aliases.items()}
+                if cache is not None and data_hashes is not None:
+                    self.save(cache, data_hashes[position], results[position])
+
+        return results
+
+    def load(self, cache, data_hash: str) -> dict:
+        """
+        Return dict of feature name: array for a dataset if every node is cached, otherwise None.
+        """
+
+        values = {}
+        for node in self.nodes:
+            cached = cache.load(cache.key(data_hash, node.signature, node.params, self.versions[node.signature]))
+            if cached is None:
+                return None
+            values[node.signature] = cached['values']
+
+        return {name: values[signature] for name, signature in self.aliases.items()}
+
+    def save(self, cache, data_hash: str, features: dict) -> None:
+        """
+        Store the output of evaluate() (dict of feature name: array) for a dataset, one entry per node.
+        """
+
+        names = {signature: name for name, signature in self.aliases.items()}
+        for node in self.nodes:
+            key = cache.key(data_hash, node.signature, node.params, self.versions[node.signature])
+            cache.save(key, {'values': features[names[node.signature]]})
+
+    def summary(self) -> str:
+        return (f"Feature graph: {len(self.nodes) + len(self.cross_sectional)} unique nodes from {self.declared} declared"
+                f" ({len(self.cross_sectional)} cross-sectional).")
@@ -0,0 +1,114 @@
+import pandas as pd
+import numpy as np
+
+
+def build_feature_frame(df: pd.DataFrame, features: dict, index: pd.Index, ticker: str, first=0) -> tuple:
+    """
+    Build the final simulation frame for a dataset in one allocation.
+
+    Equivalent to inserting each feature column into df, reindexing onto index with fill_value=0 and adding
+    a Ticker column, without the intermediate copies: every numeric column (base and feature) is written
+    straight into a single column-major float64 block which the returned DataFrame wraps without copying.
+    Label (object) columns are stored alongside as their own arrays.
+
+    Args:
+        df: source dataset, indexed by epoch nanosecond timestamps.
+        features: dict of feature name: array, aligned with df's rows starting at row first.
+            Feature columns are 0 outside the rows they cover.
+        index: index of the final frame. Rows of df not in index are dropped, rows of index not in df are 0.
+        ticker: value of the Ticker column.
+        first: row of df the feature arrays start at, when computed over a window of df.
+
+    Returns:
+        (frame, arrays) where arrays is a dict of column name: array of frame's values for each column.
+        Numeric arrays are views into the frame's block, so no further copies are made reading them.
+
+    Raises:
+        None.
+    """
+
+    sources = {column: df[column].to_numpy() for column in df.columns}
+    sources.update(features)
+
+    numeric = [name for name, values in sources.items() if np.asarray(values).dtype != object]
+    labels = [name for name, values in sources.items() if np.asarray(values).dtype == object]
+
+    # Position of each source row in the final index, -1 where not in the index.
+    rows = index.get_indexer(df.index)
+
+    def place(name: str, values: np.ndarray, out: np.ndarray) -> None:
+        start = first if name in features else 0
+        positions = rows[start:start + len(values)]
+        kept = positions >= 0
+        out[positions[kept]] = values[kept]
+
+    # Column-major so each column is contiguous, and pandas can hold the block as is (it stores values transposed).
+    block = np.zeros((len(index), len(numeric)), dtype=np.float64, order="F")
+    for column, name in enumerate(numeric):
+        place(name, np.asarray(sources[name], dtype=np.float64), block[:, column])
+
+    frame = pd.DataFrame(block, index=index, columns=numeric, copy=False)
+    arrays = {name: block[:, column] for column, name in enumerate(numeric)}
+
+    for name in labels:
+        values = np.zeros(len(index), dtype=object)
+        place(name, np.asarray(sources[name]), values)
+        frame[name] = values
+        arrays[name] = values
+
+    frame['Ticker'] = ticker
+    arrays['Ticker'] = np.full(len(index), ticker, dtype=object)
+
+    return frame, arrays
+
+
+class Columns:
+    """
+    Column arrays of a dataset's frame (see build_feature_frame()) with the frame's index values,
+    for reading rows without building pandas objects.
+
+    rows holds the position of each source row in the frame's index (-1 where it is not in the index),
+    i.e. the frame rows that are real bars rather than padding.
+    """
+
+    def __init__(self, arrays: dict, timestamps: np.ndarray, rows=None):
+        self.arrays = arrays
+        self.timestamps = timestamps
+        self.rows = rows if rows is not None else np.arange(len(timestamps))
+
+    def column(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def set_window(self, start: int, finish: int) -> None:
+        """
+        Limit computation to frame rows [start, finish). Columns here are already computed, see lazy.LazyColumns.
+        """
+        pass
+
+
+class RowCursor:
+    """
+    Lightweight view of one row of a dataset, given to strategies and the portfolio in place of the
+    Series frame.iloc[position] with the same field access: cursor['Close'] reads one value from the
+    column arrays and cursor.name is the row's timestamp.
+
+    One cursor is kept per dataset and moved by setting position, so reading a bar allocates nothing.
+    """
+
+    __slots__ = ('columns', 'arrays', 'position')
+
+    def __init__(self, columns: Columns, position=0):
+        self.columns = columns
+        self.arrays = columns.arrays
+        self.position = position
+
+    @property
+    def name(self):
+        return self.columns.timestamps[self.position]
+
+    def __getitem__(self, column: str):
+        try:
+            return self.arrays[column][self.position]
+        except KeyError:
+            # Not computed yet (lazy.LazyColumns), or not a column (raises KeyError).
+            return self.columns.column(column)[self.position]
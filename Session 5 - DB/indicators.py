@@ -0,0 +1,535 @@
+import pandas as pd
+import numpy as np
+
+
+def crossover(fast, slow) -> np.ndarray:
+    """
+    Detect crossovers between two series with shifted comparisons over whole arrays.
+
+    Args:
+        fast: array-like of values, 1D or 2D with time along axis 0.
+        slow: array-like of values, same shape as fast.
+
+    Returns:
+        int8 array with the same shape as the inputs:
+            1 where fast crosses above slow, -1 where fast crosses below slow, 0 otherwise.
+            The first row is always 0.
+
+    Raises:
+        None.
+    """
+
+    fast = np.asarray(fast, dtype=np.float64)
+    slow = np.asarray(slow, dtype=np.float64)
+
+    prev_fast, prev_slow = fast[:-1], slow[:-1]
+    curr_fast, curr_slow = fast[1:], slow[1:]
+
+    cross = np.zeros(fast.shape, dtype=np.int8)
+    cross[1:][(prev_slow > prev_fast) & (curr_fast > curr_slow)] = 1
+    cross[1:][(prev_slow < prev_fast) & (curr_fast < curr_slow)] = -1
+
+    return cross
+
+
+def cross_labels(cross: np.ndarray, up="BUY", down="SELL") -> np.ndarray:
+    """
+    Map crossover() output to an object array of signal labels, None where no cross occurred.
+    """
+
+    labels = np.full(cross.shape, None, dtype=object)
+    labels[cross == 1] = up
+    labels[cross == -1] = down
+
+    return labels
+
+
+def _frame(values: np.ndarray):
+    """
+    Wrap a 1D or 2D array (time along axis 0) for pandas' rolling/ewm kernels without copying.
+    """
+    return pd.Series(values) if values.ndim == 1 else pd.DataFrame(values)
+
+
+def sma(values, period=10) -> np.ndarray:
+    """
+    Simple moving average, matches pandas rolling(period).mean().
+    """
+    return _frame(np.asarray(values, dtype=np.float64)).rolling(period).mean().to_numpy()
+
+
+def ema(values, span=10) -> np.ndarray:
+    """
+    Exponential moving average, matches pandas ewm(span=span, adjust=False).mean().
+    """
+    return _frame(np.asarray(values, dtype=np.float64)).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """
+    Largest of high - low, |high - previous close| and |low - previous close|.
+    The first bar has no previous close so uses high - low.
+    """
+
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, period=14) -> np.ndarray:
+    """
+    Average true range using investopedia.com/terms/a/atr.asp definition,
+    matches atr() in data/features.py.
+    """
+    return _frame(true_range(high, low, close)).rolling(period).sum().to_numpy() / period
+
+
+def cross_signal(fast, slow) -> np.ndarray:
+    """
+    BUY/SELL labels where fast crosses above/below slow, None otherwise.
+    """
+    return cross_labels(crossover(fast, slow))
+
+
+CHUNK_ELEMENTS = 1 << 22     # values per operand when processing parameter pairs in chunks (32MB of float64)
+
+
+def ema_batch(values, spans) -> np.ndarray:
+    """
+    EMA for several spans into one array.
+
+    Each output column matches ema(values, span) exactly. The recurrence runs along the bar axis in pandas'
+    compiled ewm kernel, once per span (each span has its own decay, so spans can't share one call).
+
+    Args:
+        values: 1D array, or 2D array with time along axis 0 (e.g. bars x symbols).
+        spans: list of spans.
+
+    Returns:
+        Array of shape values.shape + (len(spans),), i.e. the last axis indexes spans.
+
+    Raises:
+        None.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    frame = _frame(values)
+
+    # Spans first while filling so each span's column is written contiguously.
+    output = np.empty((len(spans),) + values.shape, dtype=np.float64)
+    for column, span in enumerate(spans):
+        output[column] = frame.ewm(span=span, adjust=False).mean().to_numpy()
+
+    return np.moveaxis(output, 0, -1)
+
+
+def sma_batch(values, periods) -> np.ndarray:
+    """
+    SMA for several window lengths from one cumulative sum of the data.
+    Matches sma(values, period) to floating point tolerance (not bit for bit).
+
+    Args:
+        values: 1D array, or 2D array with time along axis 0.
+        periods: list of window lengths.
+
+    Returns:
+        Array of shape values.shape + (len(periods),). NaN until a window holds period valid values.
+
+    Raises:
+        None.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    rows = values.shape[0]
+
+    # Offset each column by its first valid value to keep the cumulative sums small, as rolling_sum().
+    offset = _first_valid(values)
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values - offset, 0.0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    # One column per period, each a difference of two slices of the cumulative arrays. Periods first while
+    # filling so each column is written contiguously.
+    output = np.full((len(periods),) + values.shape, np.nan)
+    for column, period in enumerate(periods):
+        if period > rows:
+            continue
+        window = output[column, period - 1:]
+        np.subtract(sums[period:], sums[:-period], out=window)
+        window /= period
+        window += offset
+        window[(counts[period:] - counts[:-period]) < period] = np.nan
+
+    return np.moveaxis(output, 0, -1)
+
+
+def crossover_grid(fast, slow, pairs: list):
+    """
+    Crossover signals for every (fast, slow) parameter pair in one call.
+
+    Pairs are processed in chunks of CHUNK_ELEMENTS values per operand, so only the int8 output grows with
+    the number of pairs, not float copies of the fast and slow columns of every pair.
+
+    Args:
+        fast: output of ema_batch()/sma_batch() for the fast parameters (last axis indexes parameters).
+        slow: output of ema_batch()/sma_batch() for the slow parameters.
+        pairs: list of (fast column, slow column) index pairs.
+
+    Returns:
+        int8 array of shape fast.shape[:-1] + (len(pairs),), see crossover().
+
+    Raises:
+        None.
+    """
+
+    output = np.empty(fast.shape[:-1] + (len(pairs),), dtype=np.int8)
+    chunk = max(CHUNK_ELEMENTS // max(int(np.prod(fast.shape[:-1])), 1), 1)
+
+    for first in range(0, len(pairs), chunk):
+        fast_columns = [pair[0] for pair in pairs[first:first + chunk]]
+        slow_columns = [pair[1] for pair in pairs[first:first + chunk]]
+        output[..., first:first + chunk] = crossover(fast[..., fast_columns], slow[..., slow_columns])
+
+    return output
+
+
+# NumPy kernels. These take and return raw arrays (1D, or 2D with time along axis 0). Windowed sums use
+# cumulative sums, O(n) regardless of window length, so results match the pandas versions to floating point
+# tolerance rather than bit for bit. Variance sums are re-anchored every window (see _rolling_moments()) so
+# their error does not grow with history. The recursive Wilder smoothing has no closed vectorized form, so its
+# recurrence runs in pandas' compiled ewm kernel on the raw array. See benchmarks.py for timings against pandas.
+
+
+def _first_valid(values: np.ndarray) -> np.ndarray:
+    """
+    First non-NaN value of each column (0 for all NaN columns).
+    """
+
+    if values.shape[0] == 0:
+        return np.zeros(values.shape[1:])
+
+    first = values[0]
+    if np.isnan(first).any():
+        first = np.take_along_axis(values, np.argmax(~np.isnan(values), axis=0)[None, ...], axis=0)[0]
+
+    return np.where(np.isnan(first), 0.0, first)
+
+
+def rolling_sum(values, period: int) -> np.ndarray:
+    """
+    Sum over a trailing window of period rows, NaN until the window holds period valid values.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    output = np.full(values.shape, np.nan)
+    if values.shape[0] < period:
+        return output
+
+    # Offset each column by its first valid value to keep the cumulative sums small.
+    offset = _first_valid(values)
+    missing = np.isnan(values)
+    complete = not missing.any()
+
+    centred = values - offset
+    if not complete:
+        centred[missing] = 0.0
+    sums = np.cumsum(centred, axis=0)
+
+    window = output[period - 1:]
+    window[0] = sums[period - 1]
+    np.subtract(sums[period:], sums[:-period], out=window[1:])
+    window += offset * period
+
+    if not complete:
+        counts = np.cumsum(~missing, axis=0)
+        valid = counts[period - 1:].copy()
+        valid[1:] -= counts[:-period]
+        window[valid < period] = np.nan
+
+    return output
+
+
+def rolling_mean(values, period: int) -> np.ndarray:
+    """
+    Simple moving average, NumPy kernel equivalent of sma().
+    """
+    return rolling_sum(values, period) / period
+
+
+def _rolling_moments(values: np.ndarray, period: int) -> tuple:
+    """
+    Rolling mean and population variance, NaN until the window holds period valid values.
+
+    Sums are re-anchored every period rows rather than accumulated over the whole history: rows are split
+    into blocks of period rows, each centred on its first value and summed on its own. A window covers the
+    start of its block and the end of the previous one, whose sums are moved onto the window's block anchor
+    by the (small) difference between the two anchors. Rounding error then depends on the spread of values
+    within two blocks, not on the length of the history.
+    """
+
+    shape = values.shape
+    values = values.reshape(shape[0], -1)
+    rows, columns = values.shape
+    if rows < period:
+        return np.full(shape, np.nan), np.full(shape, np.nan)
+
+    # (columns x blocks x period) layout, so each block's rows are contiguous. The last block is padded.
+    blocks = -(-rows // period)
+    centred = np.empty((columns, blocks * period))
+    centred[:, :rows] = values.T
+    centred[:, rows:] = np.nan
+    centred = centred.reshape(columns, blocks, period)
+
+    anchor = centred[:, :, :1].copy()
+    unanchored = np.isnan(anchor)
+    if unanchored.any():
+        anchor[unanchored] = np.broadcast_to(_first_valid(values)[:, None, None], anchor.shape)[unanchored]
+    centred -= anchor
+    missing = np.isnan(centred)
+    incomplete = missing.any()
+    if incomplete:
+        centred[missing] = 0.0
+
+    # Running sums within each block: sums[:, b, j] covers rows 0..j of block b.
+    sum_xx = np.multiply(centred, centred)
+    np.cumsum(sum_xx, axis=2, out=sum_xx)
+    sum_x = np.cumsum(centred, axis=2, out=centred)
+
+    # Window ending at row j of block b (b > 0): rows 0..j of block b plus the k = period - 1 - j rows after
+    # row j of block b - 1. Those are centred on anchor b - 1, i.e. offset by shift = anchor b - 1 - anchor b,
+    # so on anchor b their sum is tail_x + k * shift and their sum of squares
+    # tail_xx + shift * (tail_x + (tail_x + k * shift)).
+    shift = anchor[:, :-1] - anchor[:, 1:]
+    tail_x = sum_x[:, :-1, -1:] - sum_x[:, :-1]
+    tail_xx = sum_xx[:, :-1, -1:] - sum_xx[:, :-1]
+    moved_x = np.arange(period - 1, -1, -1, dtype=np.float64) * shift
+    moved_x += tail_x
+    tail_x += moved_x
+    tail_x *= shift
+    tail_xx += tail_x
+    sum_x[:, 1:] += moved_x
+    sum_xx[:, 1:] += tail_xx
+
+    window_mean = sum_x
+    window_mean /= period
+    window_variance = sum_xx
+    window_variance /= period
+    window_variance -= np.square(window_mean)
+    np.maximum(window_variance, 0.0, out=window_variance)
+    window_mean += anchor
+
+    if incomplete:
+        counts = np.cumsum(~missing, axis=2)
+        counts[:, 1:] += counts[:, :-1, -1:] - counts[:, :-1]
+        window_mean[counts < period] = np.nan
+        window_variance[counts < period] = np.nan
+
+    # Rows before period - 1 are the first block's partial windows.
+    mean = window_mean.reshape(columns, -1)[:, :rows]
+    variance = window_variance.reshape(columns, -1)[:, :rows]
+    mean[:, :period - 1] = np.nan
+    variance[:, :period - 1] = np.nan
+
+    return mean.T.reshape(shape), variance.T.reshape(shape)
+
+
+def rolling_std(values, period: int, ddof=1) -> np.ndarray:
+    """
+    Rolling standard deviation, matches pandas rolling(period).std(ddof=ddof) to floating point tolerance.
+    """
+
+    mean, variance = _rolling_moments(np.asarray(values, dtype=np.float64), period)
+    return np.sqrt(variance * (period / (period - ddof)))
+
+
+def zscore(values, period: int) -> np.ndarray:
+    """
+    Distance of each value from its rolling mean, in rolling (population) standard deviations.
+    0 where the window is constant.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    mean, variance = _rolling_moments(values, period)
+    std = np.sqrt(variance)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(std > 0, (values - mean) / std, 0.0 * std)
+
+
+def bollinger_bands(values, period=20, num_std=2.0) -> tuple:
+    """
+    Bollinger bands using population standard deviation.
+
+    Returns:
+        (middle, upper, lower) arrays.
+    """
+
+    middle, variance = _rolling_moments(np.asarray(values, dtype=np.float64), period)
+    width = num_std * np.sqrt(variance)
+
+    return middle, middle + width, middle - width
+
+
+def bollinger_upper(values, period=20, num_std=2.0) -> np.ndarray:
+    return bollinger_bands(values, period, num_std)[1]
+
+
+def bollinger_lower(values, period=20, num_std=2.0) -> np.ndarray:
+    return bollinger_bands(values, period, num_std)[2]
+
+
+def rolling_quantile(values, period: int, quantile=0.5) -> np.ndarray:
+    """
+    Quantile of a trailing window of period rows with linear interpolation, NaN until the window holds
+    period valid values. Runs in pandas' compiled rolling kernel, which keeps the window in an indexable
+    skiplist so each bar costs O(log period) rather than the O(period) of a rolling apply.
+    """
+    return _frame(np.asarray(values, dtype=np.float64)).rolling(period).quantile(quantile).to_numpy()
+
+
+def rolling_median(values, period: int) -> np.ndarray:
+    """
+    Median of a trailing window of period rows, O(log period) per bar as rolling_quantile().
+    """
+    return _frame(np.asarray(values, dtype=np.float64)).rolling(period).median().to_numpy()
+
+
+def rolling_percentile(values, period: int) -> np.ndarray:
+    """
+    Percentile rank (0 - 1] of each value within its trailing window of period rows, e.g. for a rolling ATR
+    percentile regime filter. Ties take their average rank. O(log period) per bar as rolling_quantile().
+    """
+    return _frame(np.asarray(values, dtype=np.float64)).rolling(period).rank(pct=True).to_numpy()
+
+
+def rate_of_change(values, period=10) -> np.ndarray:
+    """
+    Fractional change over period bars, values[t] / values[t - period] - 1. NaN for the first period bars.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    output = np.full(values.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        output[period:] = values[period:] / values[:-period] - 1
+
+    return output
+
+
+def wilder_smooth(values, period: int) -> np.ndarray:
+    """
+    Wilder's smoothing (RMA): seeded with the mean of the first period values, then
+    avg[t] = avg[t - 1] + (values[t] - avg[t - 1]) / period.
+    Leading NaN values are skipped, NaN until the seed.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    output = np.full(values.shape, np.nan)
+
+    columns = values.reshape(values.shape[0], -1)
+    smoothed = output.reshape(values.shape[0], -1)
+    for column in range(columns.shape[1]):
+        series = columns[:, column]
+        first = int(np.argmax(~np.isnan(series))) if not np.isnan(series).all() else series.shape[0]
+        seed = first + period - 1
+        if seed >= series.shape[0]:
+            continue
+
+        seeded = series[seed:].copy()
+        seeded[0] = series[first:seed + 1].mean()
+        smoothed[seed:, column] = pd.Series(seeded).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+
+    return output
+
+
+def wilder_atr(high, low, close, period=14) -> np.ndarray:
+    """
+    Average true range with Wilder's smoothing, the original (J. Welles Wilder) ATR definition.
+    """
+    return wilder_smooth(true_range(high, low, close), period)
+
+
+def rsi(values, period=14) -> np.ndarray:
+    """
+    Relative strength index with Wilder's smoothing, 0 - 100. The first period bars are NaN.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    delta = np.full(values.shape, np.nan)
+    delta[1:] = values[1:] - values[:-1]
+
+    avg_gain = wilder_smooth(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+    avg_loss = wilder_smooth(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), period)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = avg_gain + avg_loss
+        return np.where(total > 0, 100.0 * avg_gain / total, 50.0 + 0.0 * total)
+
+
+def band_cross(values, upper, lower) -> np.ndarray:
+    """
+    BUY where values cross back above lower, SELL where values cross back below upper, None otherwise.
+    upper and lower are arrays shaped like values (e.g. Bollinger bands) or constant thresholds.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    upper = np.broadcast_to(np.asarray(upper, dtype=np.float64), values.shape)
+    lower = np.broadcast_to(np.asarray(lower, dtype=np.float64), values.shape)
+
+    labels = np.full(values.shape, None, dtype=object)
+    labels[crossover(values, lower) == 1] = "BUY"
+    labels[crossover(values, upper) == -1] = "SELL"
+
+    return labels
+
+
+# Cross-sectional kernels. These take a (bars x symbols) matrix and work across axis 1, i.e. compare the
+# symbols with each other at each bar. NaN marks symbols without a value at a bar, which are left out.
+
+
+def cross_rank(values) -> np.ndarray:
+    """
+    Rank of each symbol at each bar, 1 for the lowest value. Ties are ranked in column order. NaN where missing.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+
+    # NaN sorts last, so valid values take ranks 1..count.
+    order = np.argsort(values, axis=1, kind="stable")
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, np.arange(1, values.shape[1] + 1, dtype=np.float64)[None, :], axis=1)
+    ranks[missing] = np.nan
+
+    return ranks
+
+
+def cross_percentile(values) -> np.ndarray:
+    """
+    Percentile rank of each symbol at each bar, 0 for the lowest value and 1 for the highest.
+    0.5 where only one symbol has a value. NaN where missing.
+    """
+
+    ranks = cross_rank(values)
+    count = np.sum(~np.isnan(ranks), axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 1, (ranks - 1) / (count - 1), 0.5 + 0.0 * ranks)
+
+
+def cross_zscore(values) -> np.ndarray:
+    """
+    Distance of each symbol's value from the mean across symbols at each bar, in (population) standard
+    deviations. 0 where all values are equal, NaN where missing.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    count = np.sum(~np.isnan(values), axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nansum(values, axis=1, keepdims=True) / count
+        std = np.sqrt(np.nansum((values - mean) ** 2, axis=1, keepdims=True) / count)
+        return np.where(std > 0, (values - mean) / std, 0.0 * values)
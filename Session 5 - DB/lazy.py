@@ -0,0 +1,66 @@
+import numpy as np
+
+from feature_graph import Feature
+from frames import Columns
+
+
+class LazyColumns(Columns):
+    """
+    Column arrays of one dataset, with feature columns computed the first time they are read.
+
+    Base columns (and any feature already computed) come from the dataset's frame arrays, see
+    frames.build_feature_frame(). A feature is computed on first access, with only the graph nodes it
+    depends on, over the source rows of the simulation's window plus the graph's warm-up. The result is
+    laid out on the frame's index like the eager path (0 outside the computed rows) and kept for later reads.
+    """
+
+    def __init__(self, graph, source: dict, rows: np.ndarray, arrays: dict, timestamps: np.ndarray):
+        """
+        Args:
+            graph: FeatureGraph of the portfolio's strategies.
+            source: dict of base column name: array of the dataset before re-indexing.
+            rows: position of each source row in the frame's index, -1 where it is not in the index.
+            arrays: dict of column name: array of the frame's values, filled in as features are computed.
+            timestamps: the frame's index values.
+        """
+
+        super().__init__(arrays, timestamps, rows)
+        self.graph = graph
+        self.source = source
+        self.values = {}        # node signature: array over source rows [begin, end)
+        self.begin = 0          # source rows needed to cover the simulation, see set_window()
+        self.end = len(rows)
+
+    def set_window(self, start: int, finish: int) -> None:
+        """
+        Limit computation to source rows that land in frame rows [start, finish), plus the graph's warm-up.
+        """
+
+        inside = np.flatnonzero((self.rows >= start) & (self.rows < finish))
+        if len(inside) == 0:
+            self.begin, self.end = 0, 0
+        else:
+            self.begin = max(int(inside[0]) - self.graph.warmup(), 0)
+            self.end = int(inside[-1]) + 1
+
+    def column(self, name: str) -> np.ndarray:
+        if name in self.arrays:
+            return self.arrays[name]
+        if name not in self.graph.aliases:
+            raise KeyError(name)
+
+        for node in self.graph.required([name]):
+            if node.signature not in self.values:
+                args = [self.values[i.signature] if isinstance(i, Feature) else self.source[i][self.begin:self.end]
+                        for i in node.inputs]
+                self.values[node.signature] = node.function(*args, **node.params)
+
+        # Lay out on the frame's index, as frames.build_feature_frame().
+        computed = np.asarray(self.values[self.graph.aliases[name]])
+        rows = self.rows[self.begin:self.end]
+        kept = rows >= 0
+        values = np.zeros(len(self.timestamps), dtype=object if computed.dtype == object else np.float64)
+        values[rows[kept]] = computed[kept]
+
+        self.arrays[name] = values
+        return values
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def stack_columns(arrays: list) -> np.ndarray:
+    """
+    Stack 1D arrays of (possibly) different lengths into a 2D array, one column per array.
+
+    Columns are left aligned: row i of each column is that dataset's i-th bar, and shorter columns are
+    padded with NaN (None for object arrays) at the end. Time series operations along axis 0 then give
+    the same values for each column as they would for the array on its own, whatever each market's calendar.
+
+    Args:
+        arrays: list of 1D arrays.
+
+    Returns:
+        2D array of shape (longest array, number of arrays).
+
+    Raises:
+        None.
+    """
+
+    dtype = object if any(np.asarray(a).dtype == object for a in arrays) else np.float64
+    lengths = [len(a) for a in arrays]
+
+    matrix = np.full((max(lengths, default=0), len(arrays)), None if dtype == object else np.nan, dtype=dtype)
+    for column, values in enumerate(arrays):
+        matrix[:lengths[column], column] = values
+
+    return matrix
+
+
+def unstack_columns(matrix: np.ndarray, lengths: list) -> list:
+    """
+    Inverse of stack_columns(): return a contiguous 1D array per column, trimmed to its original length.
+    """
+    return [np.ascontiguousarray(matrix[:length, column]) for column, length in enumerate(lengths)]
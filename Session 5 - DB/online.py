@@ -0,0 +1,412 @@
+from collections import deque
+import numpy as np
+import random
+import math
+
+
+# Streaming versions of the indicators in indicators.py. Each update is O(1) (O(log period) for quantiles),
+# and the output for every bar matches the batch (pandas) versions exactly, because the same floating point
+# operations are performed in the same order (Kahan compensated rolling sums, pandas' ewm recurrence,
+# skiplist order statistics).
+#
+# e.g. appending new bars to an existing series without recomputing history:
+#   ema = OnlineEMA(span=20)
+#   ema.extend(history)
+#   state = ema.snapshot()       # json-serialisable dict
+#   ...
+#   ema = OnlineEMA.restore(state)
+#   ema.update(new_close)
+
+
+class OnlineIndicator:
+
+    def update(self, *values) -> float:
+        raise NotImplementedError
+
+    def extend(self, *columns) -> np.ndarray:
+        """
+        Update with each row of the given column arrays in turn, return array of outputs.
+        """
+        return np.array([self.update(*row) for row in zip(*columns)], dtype=np.float64)
+
+    def snapshot(self) -> dict:
+        """
+        Return the indicator state as a json-serialisable dict.
+        """
+        return {key: list(value) if isinstance(value, deque) else value for key, value in self.__dict__.items()}
+
+    @classmethod
+    def restore(cls, state: dict):
+        """
+        Return a new indicator from a snapshot() dict.
+        """
+        indicator = cls.__new__(cls)
+        indicator.__dict__.update(state)
+        for key, value in state.items():
+            if isinstance(value, list):
+                setattr(indicator, key, deque(value))
+            elif isinstance(value, dict):
+                setattr(indicator, key, dict(value))
+
+        return indicator
+
+
+class _RollingSum:
+    """
+    Fixed window sum replicating pandas' roll_sum/roll_mean state: separate Kahan compensation terms for
+    values entering and leaving the window, plus the count of consecutive equal values pandas uses to
+    remove floating point artifacts from constant windows.
+    """
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = None
+
+    def state(self) -> dict:
+        return {key: list(value) if isinstance(value, deque) else value for key, value in self.__dict__.items()}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        rolling = cls.__new__(cls)
+        rolling.__dict__.update(state)
+        rolling.window = deque(state['window'])
+        return rolling
+
+    def push(self, value: float) -> None:
+        # Remove the value leaving the window first, as pandas does.
+        if len(self.window) == self.period:
+            old = self.window.popleft()
+            if not math.isnan(old):
+                self.nobs -= 1
+                y = -old - self.compensation_remove
+                t = self.sum_x + y
+                self.compensation_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+
+        if self.prev_value is None:
+            self.prev_value = value
+
+        self.window.append(value)
+        if not math.isnan(value):
+            self.nobs += 1
+            y = value - self.compensation_add
+            t = self.sum_x + y
+            self.compensation_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct += 1
+
+            if value == self.prev_value:
+                self.num_consecutive_same_value += 1
+            else:
+                self.num_consecutive_same_value = 1
+            self.prev_value = value
+
+    def total(self) -> float:
+        if self.nobs < self.period:
+            return math.nan
+        if self.num_consecutive_same_value >= self.nobs:
+            return self.prev_value * self.nobs
+        return self.sum_x
+
+    def mean(self) -> float:
+        if self.nobs < self.period or self.nobs == 0:
+            return math.nan
+
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+
+        return result
+
+
+class OnlineSMA(OnlineIndicator):
+    """
+    Simple moving average, matches indicators.sma().
+    """
+
+    def __init__(self, period=10):
+        self.period = period
+        self.rolling = _RollingSum(period)
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        self.rolling.push(float(close))
+        self.value = self.rolling.mean()
+        return self.value
+
+    def snapshot(self) -> dict:
+        return {'period': self.period, 'rolling': self.rolling.state(), 'value': self.value}
+
+    @classmethod
+    def restore(cls, state: dict):
+        indicator = cls(state['period'])
+        indicator.rolling = _RollingSum.from_state(state['rolling'])
+        indicator.value = state['value']
+        return indicator
+
+
+class OnlineEMA(OnlineIndicator):
+    """
+    Exponential moving average, matches indicators.ema() i.e. ewm(span=span, adjust=False).mean().
+    """
+
+    def __init__(self, span=10):
+        self.span = span
+
+        # Same arithmetic as pandas: span -> centre of mass -> alpha.
+        com = (span - 1) / 2.0
+        alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = alpha
+        self.old_wt = 1.0
+        self.value = math.nan
+
+    def update(self, close: float) -> float:
+        close = float(close)
+
+        if self.value == self.value:
+            # Missing values still decay the previous weight (ignore_na=False).
+            self.old_wt *= self.old_wt_factor
+            if close == close:
+                # Constant series are left unchanged to avoid numerical drift, as in pandas.
+                if self.value != close:
+                    self.value = (self.old_wt * self.value + self.new_wt * close) / (self.old_wt + self.new_wt)
+                self.old_wt = 1.0
+        elif close == close:
+            self.value = close
+
+        return self.value
+
+
+class OnlineATR(OnlineIndicator):
+    """
+    Average true range, matches indicators.atr().
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self.rolling = _RollingSum(period)
+        self.prev_close = math.nan
+        self.value = math.nan
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low, close = float(high), float(low), float(close)
+
+        # np.fmax semantics: NaN only if all candidates are NaN.
+        ranges = [r for r in (high - low, abs(high - self.prev_close), abs(low - self.prev_close)) if r == r]
+        true_range = max(ranges) if ranges else math.nan
+
+        self.rolling.push(true_range)
+        self.prev_close = close
+        self.value = self.rolling.total() / self.period
+
+        return self.value
+
+    def snapshot(self) -> dict:
+        return {'period': self.period, 'rolling': self.rolling.state(), 'prev_close': self.prev_close, 'value': self.value}
+
+    @classmethod
+    def restore(cls, state: dict):
+        indicator = cls(state['period'])
+        indicator.rolling = _RollingSum.from_state(state['rolling'])
+        indicator.prev_close = state['prev_close']
+        indicator.value = state['value']
+        return indicator
+
+
+class _Node:
+
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value: float, levels: int):
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class _Skiplist:
+    """
+    Indexable skiplist: a sorted multiset of floats with O(log n) expected insert, remove and k-th smallest.
+    Each link stores its width (the number of bottom level nodes it skips) so positions can be found by
+    walking down the levels, the structure pandas uses for its rolling quantile/median kernels.
+    """
+
+    def __init__(self, expected_size=100):
+        self.size = 0
+        self.levels = int(1 + math.log(max(expected_size, 2), 2))
+        self.tail = _Node(math.inf, 0)
+        self.head = _Node(math.nan, self.levels)
+        self.head.next = [self.tail] * self.levels
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position: int) -> float:
+        """
+        Return the value at position (0 is the smallest).
+        """
+
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+
+        node = self.head
+        position += 1
+        for level in reversed(range(self.levels)):
+            while node.width[level] <= position:
+                position -= node.width[level]
+                node = node.next[level]
+
+        return node.value
+
+    def insert(self, value: float) -> None:
+
+        # Last node before value on each level, and how many positions each step moved.
+        chain = [None] * self.levels
+        steps_at_level = [0] * self.levels
+        node = self.head
+        for level in reversed(range(self.levels)):
+            while node.next[level] is not self.tail and node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = min(self.levels, 1 - int(math.log(1.0 - random.random(), 2.0)))
+        new = _Node(value, height)
+        steps = 0
+        for level in range(height):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+
+        for level in range(height, self.levels):
+            chain[level].width[level] += 1
+
+        self.size += 1
+
+    def remove(self, value: float) -> None:
+
+        chain = [None] * self.levels
+        node = self.head
+        for level in reversed(range(self.levels)):
+            while node.next[level] is not self.tail and node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self.tail or target.value != value:
+            raise KeyError(value)
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+
+        for level in range(len(target.next), self.levels):
+            chain[level].width[level] -= 1
+
+        self.size -= 1
+
+
+class OnlineQuantile(OnlineIndicator):
+    """
+    Rolling quantile with linear interpolation, matches indicators.rolling_quantile().
+    The window's valid values are kept in an indexable skiplist, so each update is O(log period).
+    """
+
+    def __init__(self, period=20, quantile=0.5):
+        self.period = period
+        self.quantile = quantile
+        self.window = deque()
+        self.sorted = _Skiplist(period)
+        self.value = math.nan
+
+    def push(self, value: float) -> None:
+        if len(self.window) == self.period:
+            old = self.window.popleft()
+            if old == old:
+                self.sorted.remove(old)
+
+        self.window.append(value)
+        if value == value:
+            self.sorted.insert(value)
+
+    def result(self) -> float:
+        nobs = len(self.sorted)
+        if nobs < self.period:
+            return math.nan
+        if nobs == 1:
+            return self.sorted[0]
+
+        # Same arithmetic as pandas' roll_quantile (linear interpolation).
+        position = self.quantile * (nobs - 1)
+        lower = int(position)
+        if lower == position:
+            return self.sorted[lower]
+
+        low = self.sorted[lower]
+        return low + (self.sorted[lower + 1] - low) * (position - lower)
+
+    def update(self, value: float) -> float:
+        self.push(float(value))
+        self.value = self.result()
+        return self.value
+
+    def snapshot(self) -> dict:
+        return {'period': self.period, 'quantile': self.quantile, 'window': list(self.window), 'value': self.value}
+
+    @classmethod
+    def restore(cls, state: dict):
+        indicator = cls(state['period'], state['quantile'])
+        for value in state['window']:
+            indicator.push(value)
+        indicator.value = state['value']
+        return indicator
+
+
+class OnlineMedian(OnlineQuantile):
+    """
+    Rolling median, matches indicators.rolling_median().
+    """
+
+    def __init__(self, period=20):
+        super().__init__(period, 0.5)
+
+    def result(self) -> float:
+        nobs = len(self.sorted)
+        if nobs < self.period:
+            return math.nan
+
+        # Same arithmetic as pandas' roll_median_c.
+        middle = nobs // 2
+        if nobs % 2 == 1:
+            return self.sorted[middle]
+
+        return (self.sorted[middle] + self.sorted[middle - 1]) / 2
+
+    def snapshot(self) -> dict:
+        return {'period': self.period, 'window': list(self.window), 'value': self.value}
+
+    @classmethod
+    def restore(cls, state: dict):
+        indicator = cls(state['period'])
+        for value in state['window']:
+            indicator.push(value)
+        indicator.value = state['value']
+        return indicator
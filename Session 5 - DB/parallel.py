@@ -0,0 +1,238 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import os
+
+from matrix import stack_columns, unstack_columns
+from frames import Columns, RowCursor
+from vectorized import signal_bars, stop_bar
+
+
+# Process pool helpers. Arrays are passed between processes through shared memory blocks; only small
+# (name, shape, dtype) specs are pickled. Label (object) arrays are converted to fixed width strings for
+# transfer, as in feature_cache.py.
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def share(array: np.ndarray) -> tuple:
+    """
+    Copy an array into a new shared memory block.
+
+    Returns:
+        (SharedMemory, spec) where spec = (block name, shape, dtype string) identifies the array in other processes.
+        The caller must close() and unlink() the block once it is no longer needed.
+    """
+
+    array = np.asarray(array)
+    if array.dtype == object:
+        array = np.where(np.equal(array, None), "", array).astype(str)
+
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach(spec: tuple) -> tuple:
+    """
+    Open a shared memory block created by share().
+
+    Returns:
+        (SharedMemory, array view of the block). The view is only valid until the block is closed.
+    """
+
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def collect(spec: tuple) -> np.ndarray:
+    """
+    Copy an array out of a shared memory block and release the block. Strings are converted back to labels.
+    """
+
+    block, view = attach(spec)
+    if view.dtype.kind == "U":
+        array = view.astype(object)
+        array[array == ""] = None
+    else:
+        array = view.copy()
+
+    block.close()
+    block.unlink()
+
+    return array
+
+
+def _evaluate_chunk(graph, specs: dict, lengths: list, matrix_features: bool) -> dict:
+    """
+    Worker: compute every node for a chunk of datasets whose base columns are in shared memory.
+
+    Returns:
+        Dict of node signature: spec of a shared (bars x datasets) output block.
+    """
+
+    blocks = {}
+    columns = {}
+    for column, spec in specs.items():
+        blocks[column], columns[column] = attach(spec)
+
+    datasets = [{column: columns[column][:length, position] for column in columns}
+                for position, length in enumerate(lengths)]
+
+    if matrix_features:
+        features = graph.evaluate_many(datasets)
+    else:
+        features = [graph.evaluate(dataset) for dataset in datasets]
+
+    outputs = {}
+    names = {signature: name for name, signature in graph.aliases.items()}
+    for node in graph.nodes:
+        block, outputs[node.signature] = share(stack_columns([values[names[node.signature]] for values in features]))
+        block.close()
+
+    for block in blocks.values():
+        block.close()
+
+    return outputs
+
+
+def evaluate_parallel(graph, datasets: list, workers=None, cache=None, data_hashes=None, matrix_features=True) -> list:
+    """
+    Compute a FeatureGraph for a list of datasets over a pool of worker processes.
+
+    Datasets are split into one chunk per worker. Each chunk's base columns are copied once into shared
+    memory, workers compute the chunk (see FeatureGraph.evaluate_many()) and write the outputs back into
+    shared memory, so DataFrames are never pickled. Cached datasets are loaded in this process and not sent.
+
+    Args:
+        datasets: list of dicts of base column name: array, one per dataset.
+        workers: number of worker processes, defaults to the number of CPUs.
+        cache: optional FeatureCache.
+        data_hashes: list of dataset content hashes, required when using a cache.
+        matrix_features: if True workers compute their chunk as one matrix, otherwise dataset by dataset.
+
+    Returns:
+        List of dicts of feature name: array, one per dataset, as FeatureGraph.evaluate_many().
+
+    Raises:
+        None.
+    """
+
+    workers = workers or default_workers()
+
+    results = [None] * len(datasets)
+    if cache is not None and data_hashes is not None:
+        results = [graph.load(cache, data_hash) for data_hash in data_hashes]
+
+    pending = [position for position, result in enumerate(results) if result is None]
+    if len(pending) == 0:
+        return results
+
+    chunks = [chunk.tolist() for chunk in np.array_split(pending, min(workers, len(pending)))]
+
+    blocks = []
+    try:
+        # Share inputs before starting the pool so every worker uses this process's resource tracker.
+        jobs = []
+        for chunk in chunks:
+            lengths = [len(datasets[position][graph.inputs[0]]) for position in chunk] if graph.inputs else [0] * len(chunk)
+            specs = {}
+            for column in graph.inputs:
+                block, specs[column] = share(stack_columns([datasets[position][column] for position in chunk]))
+                blocks.append(block)
+            jobs.append((chunk, specs, lengths))
+
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = [(chunk, lengths, pool.submit(_evaluate_chunk, graph, specs, lengths, matrix_features))
+                       for chunk, specs, lengths in jobs]
+
+            for chunk, lengths, future in futures:
+                outputs = {signature: unstack_columns(collect(spec), lengths)
+                           for signature, spec in future.result().items()}
+
+                for column, position in enumerate(chunk):
+                    results[position] = {name: outputs[signature][column] for name, signature in graph.aliases.items()}
+                    if cache is not None and data_hashes is not None:
+                        graph.save(cache, data_hashes[position], results[position])
+
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return results
+
+
+def _partition_signals(strategies: list, datasets: list, start_index: int, finish_index: int) -> list:
+    """
+    Worker: the per-symbol part of a simulation for a partition of datasets. Finds every strategy's signals
+    and, for each, the bar its stop would first trigger on were a position opened from it.
+
+    Args:
+        datasets: list of (column arrays, timestamps) of each dataset's frame, see frames.Columns.
+
+    Returns:
+        List per dataset of list per strategy of [(bar, signal, stop bar or None), ..].
+    """
+
+    results = []
+    for arrays, timestamps in datasets:
+        columns = Columns(arrays, timestamps)
+        cursor = RowCursor(columns)
+
+        found = []
+        for strategy in strategies:
+            signals = []
+            for bar in signal_bars(columns, strategy, start_index, finish_index):
+                cursor.position = int(bar)
+                signal = strategy.check_for_signal(cursor)
+                if signal:
+                    stop = stop_bar(arrays, signal['direction'], signal['stop'], int(bar), finish_index)
+                    signals.append((int(bar), signal, stop))
+            found.append(signals)
+
+        results.append(found)
+
+    return results
+
+
+def partition_signals(strategies: list, datasets: list, start_index: int, finish_index: int, workers=None) -> list:
+    """
+    Run _partition_signals() over a pool of worker processes, one contiguous partition of datasets per worker.
+
+    Column arrays are pickled to the workers as is, rather than through shared memory, as signals may
+    read label columns which must keep their values (None, 0 or labels) exactly.
+
+    Args:
+        strategies: strategy objects (classes, or instances such as EMACross1020.variant()), which must be
+            picklable, i.e. of classes importable by the workers.
+        datasets: list of (column arrays, timestamps) of each dataset's frame, see frames.Columns.
+        start_index, finish_index: bars [start_index, finish_index) are simulated.
+        workers: number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        As _partition_signals(), for all datasets in the order given.
+
+    Raises:
+        None.
+    """
+
+    workers = workers or default_workers()
+    if len(datasets) == 0:
+        return []
+
+    partitions = [chunk.tolist() for chunk in np.array_split(np.arange(len(datasets)), min(workers, len(datasets)))]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=len(partitions)) as pool:
+        futures = [pool.submit(_partition_signals, strategies, [datasets[d] for d in partition], start_index,
+                               finish_index) for partition in partitions]
+        for future in futures:
+            results.extend(future.result())
+
+    return results
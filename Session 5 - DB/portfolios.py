@@ -9,23 +9,33 @@ import traceback
 import os
 
 from strategies import EMACross1020
+from timestamps import to_timedelta, format_records
 
 
 class TestPortfolio():
 
-    def __init__(self):
+    def __init__(self, **settings):
+        """
+        Args:
+            settings: optional values replacing the default settings below, e.g. start_equity=500000. Applied
+                before any state is derived from the settings, and validated with them.
+
+        Raises:
+            ValueError if a setting is not known or settings are invalid.
+        """
+
         self.name = "Test Portfolio"
         self.currency = "USD"
         self.start_date = datetime.now() - relativedelta(years=5)
         self.finish_date = None
         self.start_equity = 1000000
-        self.current_equity = self.start_equity
         self.open_equity = 0
         self.trade_history = []                     # [{tx pnl data}, ..]
 
         self.report = None
         self.positions = {}                         # positions[symbol][strategy] ..
         self.position_count = 0
+        self.open_symbols = {}                      # open_symbols[symbol] = number of open positions
         self.total_trades = 0
 
         self.simulated_fee_flat = 5                 # dollar value added to each transaction cost
@@ -34,10 +44,11 @@ class TestPortfolio():
         self.max_simultaneous_positions = 10
         self.correlation_threshold = 1              # 1 for simplicity, allowing correlated trades
         self.max_correlated_positions = 4
+        self.correlation_window = 90                # bars used for rolling correlation between symbols
+        self.correlations = {}                      # correlations[timeframe] = CorrelationIndex, set by Backtester
+        self.bar_index = 0                          # current bar, set by Backtester
 
         self.drawdown_limit_percentage = 15         # percentage loss of starting capital trading will cease at
-        self.drawdown_watermark = self.current_equity
-        self.high_watermark = self.current_equity
 
         self.use_kelly = True
         self.max_risk_per_trade_percentage = 2.5    # max loss per trade, when not using kelly fraction.
@@ -53,9 +64,6 @@ class TestPortfolio():
         self.total_winners = 0
         self.total_losers = 0
 
-        # This implementation is limited to supporting one timeframe.
-        self.timeframes = ["1d"]
-
         self.assets = {
             "EQUITIES": ["GOOGL", "AMZN", "TSLA", "F"],
             "CURRENCIES": ["EURUSD=X", "GBPUSD=X", "AUDUSD=X"],
@@ -64,6 +72,16 @@ class TestPortfolio():
             "CRYPTO": ["BTC-USD"]
         }
 
+        for key, value in settings.items():
+            if not hasattr(self, key):
+                raise ValueError(str("Portfolio has no setting " + key + "."))
+            setattr(self, key, value)
+
+        # State derived from the settings.
+        self.current_equity = self.start_equity
+        self.drawdown_watermark = self.current_equity
+        self.high_watermark = self.current_equity
+
         self.assets_flattened = [i for j in self.assets.values() for i in j]
 
         # Invert asset dict for ease of mapping symbol : asset class
@@ -82,6 +100,10 @@ class TestPortfolio():
 
         self.transaction_history = {a: {s: [] for s in self.strategies.keys()} for a in self.assets_flattened}   # tx_history[symbol][strategy] ..
 
+        # Timeframes in use follow the strategies. Strategies on different timeframes are merged bar by bar in
+        # timestamp order by the Backtester (see Backtester.run_streams()).
+        self.timeframes = sorted({strategy['object'].timeframe for strategy in self.strategies.values()})
+
         # Asset class allocations across all asset classes must total 100.
         # Likewise strategy allocations within each asset class must total 100.
         self.allocations = {
@@ -200,7 +222,18 @@ class TestPortfolio():
                 should_trade = False
                 self.active = False
 
-        # TODO: correlation threshold check
+        # Correlation check: don't exceed max_correlated_positions open positions whose correlation with the
+        # signal's symbol is above correlation_threshold. A threshold of 1 allows all correlated trades.
+        if should_trade and self.correlation_threshold < 1 and signal['timeframe'] in self.correlations:
+            correlations = self.correlations[signal['timeframe']].correlations(
+                self.bar_index, signal['symbol'], self.open_symbols)
+            correlated = 0
+            for symbol, correlation in correlations.items():
+                if correlation > self.correlation_threshold:
+                    correlated += self.open_symbols[symbol]
+
+            if correlated >= self.max_correlated_positions:
+                should_trade = False
 
         return should_trade
 
@@ -225,6 +258,8 @@ class TestPortfolio():
                 'size': size,
                 'fees': entry_fees,
                 'direction': signal['direction'],
+                'symbol': signal['symbol'],
+                'asset_class': signal['asset_class'],
                 'strategy': signal['strategy'],
                 'timeframe': signal['timeframe'],
                 'timestamp': signal['timestamp'],
@@ -240,13 +275,14 @@ class TestPortfolio():
                 self.positions[signal['symbol']][signal['strategy']] = position
 
             self.position_count += 1
+            self.open_symbols[signal['symbol']] = self.open_symbols.get(signal['symbol'], 0) + 1
 
             self.transaction_history[signal['symbol']][signal['strategy']].append({
                 'qty': position['size'],
                 'price': signal['entry'],
                 'direction': signal['direction'],
                 'fees': entry_fees,
-                'timestamp': str(signal['timestamp'])
+                'timestamp': signal['timestamp']
             })
 
             # Update allocation records.
@@ -265,7 +301,7 @@ class TestPortfolio():
             'price': signal['entry'],
             'direction': signal['direction'],
             'fees': self.calculate_fees(self.positions[signal['symbol']][signal['strategy']]['size']),
-            'timestamp': str(signal['timestamp'])
+            'timestamp': signal['timestamp']
         })
 
         # Update allocation records.
@@ -279,6 +315,9 @@ class TestPortfolio():
         # Remove position from portfolio.
         self.positions[signal['symbol']][signal['strategy']] = None
         self.position_count -= 1
+        self.open_symbols[signal['symbol']] -= 1
+        if self.open_symbols[signal['symbol']] == 0:
+            del self.open_symbols[signal['symbol']]
         self.total_trades += 1
 
     def modify_position(self, signal: dict) -> None:
@@ -301,10 +340,10 @@ class TestPortfolio():
         signal = None
 
         try:
-            position = self.positions[bar['ticker']][strategy]
+            position = self.positions[bar['Ticker']][strategy]
 
-            # Check if stops were triggered.
-            if position:
+            # Check if stops were triggered. Padded bars (market closed) have zero prices and can't trigger stops.
+            if position and bar['Close'] != 0:
                 stop_exit_signal = {
                     'timestamp': bar.name,
                     "symbol": position['symbol'],
@@ -404,16 +443,17 @@ class TestPortfolio():
             "symbol": signal['symbol'],
             "exit_mode": signal['mode'],
             "asset_class": signal['asset_class'],
-            "open_timestamp": str(position['timestamp']),
-            "close_timestamp": str(signal['timestamp']),
+            "open_timestamp": position['timestamp'],
+            "close_timestamp": signal['timestamp'],
         })
 
-    def calculate_open_equity_for_position(self, asset_class: str, symbol: str, strategy: object, price: float, timestamp: datetime) -> None:
+    def calculate_open_equity_for_position(self, asset_class: str, symbol: str, strategy: object, price: float, timestamp: int) -> None:
         """
         Finds unrealised pnl for a given position and adds it to self.open_equity.
         """
 
-        position = self.positions[symbol][strategy.name]
+        # Symbols may not have had a position in a short simulation.
+        position = self.positions.get(symbol, {}).get(strategy.name)
         if position:
 
             entry = position['entry']
@@ -483,8 +523,8 @@ class TestPortfolio():
                 "symbol": symbol,
                 "exit_mode": "SIGNAL",
                 "asset_class": asset_class,
-                "open_timestamp": str(position['timestamp']),
-                "close_timestamp": str(timestamp),
+                "open_timestamp": position['timestamp'],
+                "close_timestamp": timestamp,
             })
 
     def metrics(self, display=True) -> str:
@@ -506,8 +546,7 @@ class TestPortfolio():
             r = abs_r if trade['net_pnl'] > 0 else -abs_r
             self.trade_history[index]['r'] = r
 
-            fs = "%Y-%m-%d %H:%M:%S"
-            hold_time = datetime.strptime(trade['close_timestamp'], fs) - datetime.strptime(trade['open_timestamp'], fs)
+            hold_time = to_timedelta(trade['close_timestamp'] - trade['open_timestamp'])
             self.trade_history[index]['hold_time'] = hold_time
             avg_size += trade['size']
             avg_hold_time += hold_time
@@ -767,15 +806,20 @@ class TestPortfolio():
         with open("results/" + path + "strategy_performance.json", "w", encoding="utf-8") as file:
             json.dump(output, file, ensure_ascii=False, indent=2)
 
-        output = json.dumps(self.trade_history, default=str)
+        # Epoch timestamps are converted to text here, at the output boundary.
+        output = json.dumps(format_records(self.trade_history), default=str)
         with open("results/" + path + "trades.json", "w", encoding="utf-8") as file:
             json.dump(output, file, ensure_ascii=False, indent=2)
 
-        output = json.dumps(self.positions, default=str)
+        positions = {symbol: {strategy: format_records([position])[0] if position else None
+                              for strategy, position in strategies.items()} for symbol, strategies in self.positions.items()}
+        output = json.dumps(positions, default=str)
         with open("results/" + path + "positions.json", "w", encoding="utf-8") as file:
             json.dump(output, file, ensure_ascii=False, indent=2)
 
-        output = json.dumps(self.transaction_history, default=str)
+        transactions = {symbol: {strategy: format_records(records) for strategy, records in strategies.items()}
+                        for symbol, strategies in self.transaction_history.items()}
+        output = json.dumps(transactions, default=str)
         with open("results/" + path + "transactions.json", "w", encoding="utf-8") as file:
             json.dump(output, file, ensure_ascii=False, indent=2)
 
@@ -1,5 +1,8 @@
 import pandas as pd
 
+from feature_graph import Feature
+from indicators import ema, cross_signal, zscore, bollinger_upper, bollinger_lower, band_cross
+
 
 class EMACross1020:
 
@@ -11,35 +14,34 @@ class EMACross1020:
     p_win = {}     # p_win[symbol][timeframe] = float
     avg_r = {}     # avg_r[symbol][timeframe][kelly/flat] = float
 
-    def feature_data(data: pd.DataFrame, slow=20, fast=10) -> [pd.Series]:
+    # Feature nodes, see feature_graph.py. Nodes shared with other strategies are computed once.
+    # Use a "Cross" column for if-or-not a cross occurred on that row.
+    # EMAs never fully forget old values, their lookback is 4 spans (remaining weight of older bars < 0.1%).
+    fast_ema = Feature("10EMA", ema, ["Close"], lookback=40, span=10)
+    slow_ema = Feature("20EMA", ema, ["Close"], lookback=80, span=20)
+    features = [fast_ema, slow_ema, Feature("Cross", cross_signal, [fast_ema, slow_ema], lookback=1)]
+    signal_column = "Cross"     # check_for_signal() only signals where this is set, see Backtester.signal_bars()
+
+    def __init__(self, fast_span=10, slow_span=20):
+        """
+        The strategy with other EMA spans, see variant(). The class itself uses the default spans.
+        """
+
+        self.fast_ema = Feature(f"{fast_span}EMA", ema, ["Close"], lookback=4 * fast_span, span=fast_span)
+        self.slow_ema = Feature(f"{slow_span}EMA", ema, ["Close"], lookback=4 * slow_span, span=slow_span)
+        self.features = [self.fast_ema, self.slow_ema,
+                         Feature("Cross", cross_signal, [self.fast_ema, self.slow_ema], lookback=1)]
+
+    @classmethod
+    def variant(cls, fast_span=10, slow_span=20):
         """
-        Use a third "cross" column for if-or-not a cross occurred on that row.
+        Return a copy of the strategy using different EMA spans, e.g. for parameter sweeps (see sweep.py).
+        The copy is an instance of the strategy class, so it pickles (e.g. to worker processes, see
+        parallel.py) like the class itself. The name is kept so portfolio allocations still apply.
         """
-        slow_ema = data['Close'].ewm(span=slow, adjust=False).mean().rename('EMA20')
-        fast_ema = data['Close'].ewm(span=fast, adjust=False).mean().rename('EMA10')
-        cross = pd.Series(None, index=data.index, dtype="object").rename("Cross")
-
-        # Populate cross column.
-        # If using timeframes more granular than 1d you'll want to optimise this to cut processing time.
-        # (or if using more than 1-2k bars per dataset)
-        temp_df = pd.concat([fast_ema, slow_ema], axis=1)
-        for index in range(0, temp_df.shape[0]):
-            if index > 0:
-                prev_slow = temp_df.iloc[index - 1]["EMA20"]
-                prev_fast = temp_df.iloc[index - 1]["EMA10"]
-                curr_slow = temp_df.iloc[index]["EMA20"]
-                curr_fast = temp_df.iloc[index]["EMA10"]
-
-                # Buy side check (fast crosses above slow)
-                if (prev_slow > prev_fast) and (curr_fast > curr_slow):
-                    cross.iloc[index] = "BUY"
-
-                # Sell side check (slow crosses above fast)
-                elif (prev_slow < prev_fast) and (curr_fast < curr_slow):
-                    cross.iloc[index] = "SELL"
-
-        return [("10EMA", fast_ema), ("20EMA", slow_ema), ("Cross", cross)]
+        return cls(fast_span, slow_span)
 
+    @staticmethod
     def check_for_signal(data: pd.Series) -> dict:
         """
         Return a signal if one presents, or None.
@@ -65,3 +67,83 @@ class EMACross1020:
             }
 
         return signal
+
+
+class MeanReversion:
+
+    name = "MeanReversion"
+    timeframe = "1d"
+
+    p_win = {}     # p_win[symbol][timeframe] = float
+    avg_r = {}     # avg_r[symbol][timeframe][kelly/flat] = float
+
+    # BUY when close returns above -2 standard deviations from its 20 bar mean, SELL when it returns below +2.
+    z_score = Feature("ZScore20", zscore, ["Close"], lookback=19, period=20)
+    features = [z_score, Feature("MRSignal", band_cross, [z_score], lookback=1, upper=2.0, lower=-2.0)]
+    signal_column = "MRSignal"
+
+    @staticmethod
+    def check_for_signal(data: pd.Series) -> dict:
+        """
+        Return a signal if one presents, or None.
+
+        Stop: 150% of bar range.
+        Take profit: not set, uses separate exit signal.
+        """
+        signal = None
+
+        if data['MRSignal'] == "BUY" or data['MRSignal'] == "SELL":
+
+            stop_dist = abs(data['High'] - data['Low']) * 1.5
+            stop = data['Close'] - stop_dist if data['MRSignal'] == "BUY" else data['Close'] + stop_dist
+
+            signal = {
+                'timestamp': data.name,
+                'direction': data['MRSignal'],
+                'entry': data['Close'],
+                'stop': stop,
+                'targets': []
+            }
+
+        return signal
+
+
+class BBSimple:
+
+    name = "BBSimple"
+    timeframe = "1d"
+
+    p_win = {}     # p_win[symbol][timeframe] = float
+    avg_r = {}     # avg_r[symbol][timeframe][kelly/flat] = float
+
+    # 20 bar, 2 standard deviation Bollinger bands. BUY when close crosses back inside the lower band,
+    # SELL when close crosses back inside the upper band.
+    upper = Feature("BBUpper", bollinger_upper, ["Close"], lookback=19, period=20, num_std=2.0)
+    lower = Feature("BBLower", bollinger_lower, ["Close"], lookback=19, period=20, num_std=2.0)
+    features = [upper, lower, Feature("BBSignal", band_cross, ["Close", upper, lower], lookback=1)]
+    signal_column = "BBSignal"
+
+    @staticmethod
+    def check_for_signal(data: pd.Series) -> dict:
+        """
+        Return a signal if one presents, or None.
+
+        Stop: 150% of bar range.
+        Take profit: not set, uses separate exit signal.
+        """
+        signal = None
+
+        if data['BBSignal'] == "BUY" or data['BBSignal'] == "SELL":
+
+            stop_dist = abs(data['High'] - data['Low']) * 1.5
+            stop = data['Close'] - stop_dist if data['BBSignal'] == "BUY" else data['Close'] + stop_dist
+
+            signal = {
+                'timestamp': data.name,
+                'direction': data['BBSignal'],
+                'entry': data['Close'],
+                'stop': stop,
+                'targets': []
+            }
+
+        return signal
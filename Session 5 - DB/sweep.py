@@ -0,0 +1,201 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+import pandas as pd
+import numpy as np
+import numbers
+import json
+import os
+
+from portfolios import TestPortfolio
+from backtest import Backtester, SYMBOLS
+from parallel import default_workers
+from timestamps import to_epoch
+
+
+# Parameter sweeps: run the test portfolio once per combination of a parameter grid, each as its own
+# Backtester in a pool of worker processes. Data is loaded once and handed to the workers when they start.
+#
+# Grid keys are TestPortfolio settings (passed to its constructor), or "<strategy name>.<parameter>"
+# for parameters of a strategy's variant() method, e.g. "EMACross1020.fast_span".
+#
+# Each finished run is appended to a CSV file as it completes, so an interrupted sweep is resumed by
+# running it again: combinations already in the file are skipped. A run's key covers its parameters, the
+# simulated window and the Backtester arguments, so rows saved by a sweep with other settings are not reused. Runs that fail, or whose report has
+# NaN or infinite metrics, are not saved, so they are run again when resuming.
+#
+# Usage: python sweep.py
+
+
+GRID = {
+    "max_risk_per_trade_percentage": [1, 2.5],
+    "drawdown_limit_percentage": [10, 15],
+    "simulated_fee_percentage": [0.025, 0.05],
+    "EMACross1020.fast_span": [8, 10, 12],
+}
+RESULTS_FILE = "results/sweep.csv"
+
+_data = None    # datasets shared by each worker's runs, see _set_data()
+
+
+def combinations(grid: dict) -> list:
+    """
+    Every combination of a parameter grid, as a list of dicts of parameter: value, in grid order.
+    """
+
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in product(*[grid[key] for key in keys])]
+
+
+def combination_key(params: dict, start=None, finish=None, backtester_args=None) -> str:
+    """
+    Identifier of a run of a combination over [start, finish] with the given Backtester arguments, stored
+    with its results so finished runs can be skipped when resuming.
+    """
+
+    run = {
+        'params': params,
+        'start': to_epoch(start) if start is not None else None,
+        'finish': to_epoch(finish) if finish is not None else None,
+        'backtester_args': backtester_args or {}}
+
+    return json.dumps(run, sort_keys=True, default=str)
+
+
+def configure(params: dict) -> TestPortfolio:
+    """
+    Test portfolio for a combination of parameters. Portfolio settings are passed to its constructor, so state
+    derived from them (e.g. equity from start_equity) and its validation follow them.
+
+    Raises:
+        ValueError if a parameter is not a portfolio setting or a strategy of the portfolio, or settings are invalid.
+    """
+
+    settings = {}
+    variants = {}
+    for key, value in params.items():
+        if "." in key:
+            strategy, parameter = key.split(".", 1)
+            variants.setdefault(strategy, {})[parameter] = value
+        else:
+            settings[key] = value
+
+    portfolio = TestPortfolio(**settings)
+    for strategy, parameters in variants.items():
+        if strategy not in portfolio.strategies:
+            raise ValueError(str("Strategy " + strategy + " not in portfolio."))
+        portfolio.strategies[strategy]['object'] = portfolio.strategies[strategy]['object'].variant(**parameters)
+
+    return portfolio
+
+
+def _set_data(data: dict) -> None:
+    global _data
+    _data = data
+
+
+def invalid_metrics(report: dict) -> list:
+    """
+    Names of the numeric metrics of a portfolio report that are NaN or infinite.
+    """
+
+    return [key for key, value in report.items()
+            if isinstance(value, numbers.Real) and not isinstance(value, bool) and not np.isfinite(value)]
+
+
+def run_combination(params: dict, start=None, finish=None, backtester_args=None) -> dict:
+    """
+    Worker: simulate one combination of parameters and return its portfolio report with the parameters.
+
+    Raises:
+        ValueError if the run has no report or the report has NaN or infinite metrics.
+    """
+
+    portfolio = configure(params)
+    bt = Backtester(portfolio, data=_data, use_database=False, **(backtester_args or {}))
+    bt.start(start, finish, save=False)
+
+    if portfolio.report is None:
+        raise ValueError("No portfolio report.")
+    invalid = invalid_metrics(portfolio.report)
+    if invalid:
+        raise ValueError(str("Non-finite metrics: " + ", ".join(invalid) + "."))
+
+    return {'key': combination_key(params, start, finish, backtester_args), **params, 'trades': len(portfolio.trade_history), **portfolio.report}
+
+
+def completed(path: str) -> pd.DataFrame:
+    """
+    Results already saved to path, or an empty table.
+    """
+
+    if os.path.exists(path):
+        return pd.read_csv(path)
+    return pd.DataFrame({'key': []})
+
+
+def sweep(grid: dict, path=RESULTS_FILE, workers=None, start=None, finish=None, backtester_args=None) -> pd.DataFrame:
+    """
+    Run every combination of grid not already saved at path, over a process pool.
+
+    Args:
+        grid: dict of parameter: list of values, see module notes for parameter names.
+        path: CSV file each run's results are appended to. Combinations already in it, run over the same
+            start and finish with the same backtester_args, are not run again.
+        workers: number of worker processes, defaults to the number of CPUs.
+        start: optional start timestamp of each simulation, see Backtester.start().
+        finish: optional finish timestamp of each simulation.
+        backtester_args: optional dict of Backtester keyword arguments. Features are computed in each
+            worker's own process (feature_workers=1) unless given.
+
+    Returns:
+        Results table with one row per combination of grid, in grid order: parameters, number of trades and
+        the portfolio report (see TestPortfolio.metrics()).
+
+    Raises:
+        None. Runs that fail, or have NaN or infinite metrics, are reported and left out of the results (and
+        the CSV file), so they are retried when resuming.
+    """
+
+    backtester_args = {'feature_workers': 1, **(backtester_args or {})}
+    workers = workers or default_workers()
+
+    params = combinations(grid)
+    keys = [combination_key(p, start, finish, backtester_args) for p in params]
+    done = set(completed(path)['key'])
+    pending = [p for p, key in zip(params, keys) if key not in done]
+    print(f"Sweep: {len(params)} combinations, {len(params) - len(pending)} already run.")
+
+    if pending:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        data = Backtester.load_local_data(SYMBOLS)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_data, initargs=(data,)) as pool:
+            futures = {pool.submit(run_combination, p, start, finish, backtester_args): p for p in pending}
+            failed = 0
+            for number, future in enumerate(as_completed(futures), start=1):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # Not saved, so the combination is run again when resuming.
+                    failed += 1
+                    print(f"Sweep: {futures[future]} failed: {e!r}")
+                    continue
+
+                pd.DataFrame([row]).to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+                print(f"Sweep: {number}/{len(pending)} complete.")
+
+            if failed:
+                print(f"Sweep: {failed} combinations failed and will be retried on the next run.")
+
+    # Rows in grid order.
+    results = completed(path)
+    results = results[results['key'].isin(keys)].drop_duplicates('key', keep="last").set_index('key')
+
+    return results.reindex([key for key in keys if key in results.index]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    pd.set_option('display.width', None)
+    print(sweep(GRID).to_string(index=False))
@@ -1,6 +1,6 @@
 from portfolios import TestPortfolio
 from backtest import Backtester
-from copy import deepcopy
+from timestamps import format_records
 import json
 import sys
 
@@ -53,15 +53,16 @@ while(True):
         print(json.dumps(bt.portfolio.allocations, indent=2))
 
     elif option == 7:
-        print(json.dumps(bt.portfolio.transaction_history, indent=2))
+        transactions = {symbol: {strategy: format_records(records) for strategy, records in strategies.items()}
+                        for symbol, strategies in bt.portfolio.transaction_history.items()}
+        print(json.dumps(transactions, indent=2))
 
     elif option == 8:
 
-        # json.dumps wont accept timedelta objects, reformat them to strings.
-        str_trade_history = []
-        for index, trade in enumerate(bt.portfolio.trade_history):
-            str_trade_history.append(deepcopy(trade))
-            str_trade_history[index]['hold_time'] = str(str_trade_history[index]['hold_time'])
+        # json.dumps wont accept timedelta objects or epoch timestamps, reformat them to strings.
+        str_trade_history = format_records(bt.portfolio.trade_history)
+        for trade in str_trade_history:
+            trade['hold_time'] = str(trade['hold_time'])
 
         print(json.dumps(str_trade_history, indent=2))
 
@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# Session modules import each other by name, so tests import them from the session folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
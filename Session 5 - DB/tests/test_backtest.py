@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+import portfolios
+from strategies import EMACross1020
+from feature_graph import CrossSectionalFeature
+from indicators import cross_rank
+from backtest import Backtester
+from timestamps import to_epoch, to_epoch_index
+
+
+def dataset(first: str, last: str, frequency: str, seed: int) -> pd.DataFrame:
+    """
+    Random walk OHLCV dataset indexed by epoch nanoseconds.
+    """
+
+    index = to_epoch_index(pd.date_range(first, last, freq=frequency))
+    close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, len(index)))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close, 'Volume': 1000.0},
+                        index=index)
+
+
+def backtester(data: dict) -> Backtester:
+    return Backtester(portfolios.TestPortfolio(), data=data, use_database=False, use_feature_cache=False, feature_workers=1)
+
+
+def test_feature_windows_of_each_timeframe():
+    data = {'EQUITIES': {'AMZN': {'1d': dataset("2019-01-01", "2021-12-31", "D", 0),
+                                  '1wk': dataset("2019-01-07", "2021-12-27", "7D", 1)}}}
+    start, finish = to_epoch("2020-06-01"), to_epoch("2020-09-30")
+
+    bt = backtester(data)
+    bt.apply_features_all_datasets(bt.data, [EMACross1020], ['AMZN'], start, finish)
+    warmup = bt.graph.warmup()
+
+    for timeframe in ('1d', '1wk'):
+        source = data['EQUITIES']['AMZN'][timeframe]
+        frame = bt.data['EQUITIES']['AMZN'][timeframe]
+        first = source.index[max(int(source.index.searchsorted(start)) - warmup, 0)]
+        last = source.index[int(source.index.searchsorted(finish, side="right")) - 1]
+
+        covered = frame.index[frame['10EMA'].to_numpy() != 0]
+        assert (covered[0], covered[-1]) == (first, last), timeframe
+
+
+def test_close_matrix_columns_match_symbols_found():
+    data = {'EQUITIES': {'AMZN': {'1d': dataset("2020-01-01", "2020-03-31", "D", 0)},
+                         'XOM': {'1wk': dataset("2020-01-06", "2020-03-30", "7D", 1)},
+                         'WMT': {'1d': dataset("2020-01-01", "2020-02-29", "D", 2)}}}
+
+    bt = backtester(data)
+    found, matrix = bt.close_matrix(bt.data, '1d', ['AMZN', 'XOM', 'WMT'])
+
+    assert found == ['AMZN', 'WMT']
+    assert matrix.shape == (91, 2)
+    np.testing.assert_array_equal(matrix[:60, 1], data['EQUITIES']['WMT']['1d']['Close'].to_numpy())
+
+
+def test_cross_sectional_features_align_on_timestamp():
+    trend = dataset("2020-01-01", "2020-03-31", "D", 0)
+    for column in ('Open', 'High', 'Low', 'Close'):
+        trend[column] = 100.0 + 10.0 * np.arange(len(trend))
+    later = trend.iloc[14:] - 1.0
+    data = {'EQUITIES': {'AMZN': {'1d': trend}, 'XOM': {'1d': later}}}
+
+    ranked = type("Ranked", (), {'cross_features': [CrossSectionalFeature("CloseRank", cross_rank, "Close")]})
+    bt = backtester(data)
+    bt.apply_features_all_datasets(bt.data, [EMACross1020, ranked], ['AMZN', 'XOM'])
+    bt.apply_cross_sectional_features(bt.data, ['AMZN', 'XOM'])
+
+    amzn = bt.data['EQUITIES']['AMZN']['1d']['CloseRank'].to_numpy()
+    xom = bt.data['EQUITIES']['XOM']['1d']['CloseRank'].to_numpy()
+    assert len(amzn) == len(trend) and len(xom) == len(later)
+    assert (amzn[:14] == 1).all() and (amzn[14:] == 2).all()
+    assert (xom == 1).all()
+
+
+def test_empty_window_is_rejected():
+    data = {'EQUITIES': {'AMZN': {'1d': dataset("2020-01-01", "2020-03-31", "D", 0)}}}
+    portfolio = portfolios.TestPortfolio(assets={'EQUITIES': ["AMZN"]})
+    bt = Backtester(portfolio, data=data, use_database=False, use_feature_cache=False)
+
+    with pytest.raises(ValueError):
+        bt.start("2019-01-01", "2019-06-30", save=False, analyse=False)
+    assert portfolio.trade_history == []
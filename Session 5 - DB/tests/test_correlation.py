@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import CorrelationIndex
+
+
+def window_correlations(values, bar, window, min_periods):
+    frame = pd.DataFrame(values[max(bar - window + 1, 0):bar + 1])
+    return frame.corr(min_periods=min_periods).to_numpy()
+
+
+def test_rows_match_pandas():
+    values = np.cumsum(np.random.default_rng(0).normal(size=(300, 4)), axis=0)
+    values[40:70, 1] = np.nan
+    values[::7, 2] = np.nan
+    symbols = ["A", "B", "C", "D"]
+
+    index = CorrelationIndex.build(values, symbols, window=30)
+
+    # Forward through every bar (incremental updates), then backwards and in jumps (reloads).
+    bars = list(range(values.shape[0])) + [120, 5, 299, 250, 251]
+    for bar in bars:
+        expected = window_correlations(values, bar, 30, index.min_periods)
+        for symbol in symbols:
+            correlations = index.correlations(bar, symbol, symbols)
+            np.testing.assert_allclose([correlations[other] for other in symbols], expected[index.columns[symbol]],
+                                       rtol=1e-8, atol=1e-8, equal_nan=True)
+
+
+def test_correlations_skip_unknown_symbols():
+    values = np.cumsum(np.random.default_rng(1).normal(size=(50, 3)), axis=0)
+    index = CorrelationIndex.build(values, ["A", "B", "C"], window=20)
+
+    assert list(index.correlations(49, "A", ["C", "X"])) == ["C"]
+
+
+def test_columns_must_match_symbols():
+    with pytest.raises(ValueError):
+        CorrelationIndex.build(np.zeros((10, 2)), ["A", "B", "C"])
@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+
+from engine_check import mismatches
+
+
+def portfolio(trades: list) -> SimpleNamespace:
+    return SimpleNamespace(trade_history=trades, transaction_history={}, current_equity=0, open_equity=0,
+                           high_watermark=0, drawdown_watermark=0, total_fees=0, gross_profit=0, gross_loss=0,
+                           position_count=0, total_trades=0)
+
+
+def test_trade_count_message():
+    trade = {'symbol': "AMZN", 'net_pnl': 1.0}
+    assert mismatches(portfolio([trade, trade]), portfolio([trade])) == ["1 trades, 2 expected"]
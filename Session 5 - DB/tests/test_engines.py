@@ -0,0 +1,52 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+import portfolios
+from backtest import Backtester
+from engine_check import mismatches
+from timestamps import to_epoch_index
+
+
+ENGINES = {
+    'events': {'event_driven': True},
+    'streams': {'multi_timeframe': True},
+    'partitioned': {'simulation_workers': 2},
+    'vectorized': {'vectorized': True}}
+
+
+def dataset(bars: int, seed: int) -> pd.DataFrame:
+    """
+    Random walk OHLCV daily dataset indexed by epoch nanoseconds, with ranges wide enough to trigger stops.
+    """
+
+    rng = np.random.default_rng(seed)
+    index = to_epoch_index(pd.date_range("2018-01-01", periods=bars, freq="D"))
+    close = 100 + np.cumsum(rng.normal(0, 1, bars))
+    spread = np.abs(rng.normal(0, 1, bars))
+    return pd.DataFrame({'Open': close, 'High': close + spread, 'Low': close - spread, 'Close': close,
+                         'Volume': 1000.0}, index=index)
+
+
+def simulate(data: dict, assets: dict, **kwargs) -> portfolios.TestPortfolio:
+    # One symbol per asset class and room for every position, as the vectorized simulation applies no rules
+    # that reject entries (see engine_check.fixture_portfolio()).
+    symbols = [symbol for listed in assets.values() for symbol in listed]
+    portfolio = portfolios.TestPortfolio(assets=assets, max_simultaneous_positions=len(symbols) + 1)
+
+    bt = Backtester(portfolio, data=data, use_database=False, use_feature_cache=False, **kwargs)
+    bt.start(save=False, analyse=False)
+    return bt.portfolio
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_engines_match_bar_by_bar(seed):
+    assets = {'EQUITIES': ["AMZN"], 'CURRENCIES': ["EURUSD=X"], 'CRYPTO': ["BTC-USD"]}
+    data = {asset_class: {symbol: {'1d': dataset(400, seed * 10 + number)}}
+            for number, (asset_class, listed) in enumerate(assets.items()) for symbol in listed}
+
+    expected = simulate(data, assets)
+    assert len(expected.trade_history) > 10
+
+    for engine, kwargs in ENGINES.items():
+        assert mismatches(expected, simulate(data, assets, **kwargs)) == [], engine
@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import os
+
+from feature_cache import FeatureCache, TEMP_SUFFIX
+
+
+KEY = "same"
+ROUNDS = 20
+
+
+def save_repeatedly(path: str, seed: int) -> int:
+    """
+    Worker: save and read back the same key ROUNDS times, evicting on every save.
+    """
+
+    cache = FeatureCache(path, max_bytes=1)
+    values = np.full(10000, seed, dtype=np.float64)
+    for _ in range(ROUNDS):
+        cache.save(KEY, {'values': values, 'labels': np.array(["a", None], dtype=object)})
+        cache.load(KEY)
+
+    return ROUNDS
+
+
+def test_concurrent_saves_of_same_key(tmp_path):
+    path = str(tmp_path)
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        saved = list(pool.map(save_repeatedly, [path] * 4, range(4)))
+
+    assert saved == [ROUNDS] * 4
+    assert not [name for name in os.listdir(path) if name.endswith(TEMP_SUFFIX)]
+
+    cache = FeatureCache(path)
+    cache.save(KEY, {'values': np.arange(3.0)})
+    arrays = cache.load(KEY)
+    assert np.array_equal(arrays['values'], np.arange(3.0))
+
+
+def test_missing_entry_is_a_miss(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.save(KEY, {'values': np.arange(3.0), 'labels': np.array(["a", None], dtype=object)})
+
+    arrays = cache.load(KEY)
+    assert list(arrays['labels']) == ["a", None]
+
+    cache.clear()
+    assert cache.load(KEY) is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import indicators
+
+
+def random_walk(bars: int, columns=None, seed=0) -> np.ndarray:
+    size = bars if columns is None else (bars, columns)
+    return 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, size), axis=0))
+
+
+def exact_std(values: np.ndarray, period: int, ddof=1) -> np.ndarray:
+    """
+    Two pass standard deviation of each full window, NaN where the window has missing values.
+    """
+
+    output = np.full(values.shape, np.nan)
+    output[period - 1:] = sliding_window_view(values, period, axis=0).std(axis=-1, ddof=ddof)
+    return output
+
+
+def test_rolling_std_does_not_drift_over_long_histories():
+    values = random_walk(500000)
+    expected = exact_std(values, 20)
+
+    error = np.nanmax(np.abs(indicators.rolling_std(values, 20) - expected) / expected)
+    assert error < 1e-10
+
+
+def test_rolling_moments_with_missing_values():
+    values = random_walk(1003, columns=3)
+    values[5:30, 0] = np.nan
+    values[::97, 2] = np.nan
+
+    for period in (1, 2, 7, 20, 1003):
+        np.testing.assert_allclose(indicators.rolling_std(values, period, ddof=0), exact_std(values, period, ddof=0),
+                                   rtol=1e-9, atol=1e-10)
+        np.testing.assert_allclose(indicators.rolling_mean(values, period),
+                                   pd.DataFrame(values).rolling(period).mean().to_numpy(), rtol=1e-12)
+
+
+def test_zscore_of_constant_window():
+    values = np.r_[np.full(30, 5.0), 6.0]
+    assert np.isnan(indicators.zscore(values, 10)[8])
+    assert (indicators.zscore(values, 10)[9:30] == 0).all()
+    assert indicators.zscore(values, 10)[30] > 0
+
+
+def test_batches_match_single_parameter_versions(monkeypatch):
+    values = random_walk(2000, columns=2)
+    values[10:20, 1] = np.nan
+    spans, periods = [5, 10, 20], [1, 7, 20, 3000]
+
+    emas = indicators.ema_batch(values, spans)
+    smas = indicators.sma_batch(values, periods)
+    for column, span in enumerate(spans):
+        np.testing.assert_array_equal(emas[..., column], indicators.ema(values, span))
+    for column, period in enumerate(periods):
+        np.testing.assert_allclose(smas[..., column], indicators.sma(values, period), rtol=1e-12)
+
+    # Small chunks so pairs are split across several.
+    monkeypatch.setattr(indicators, "CHUNK_ELEMENTS", 5000)
+    pairs = [(fast, slow) for fast in range(len(spans)) for slow in range(len(spans))]
+    grid = indicators.crossover_grid(emas, smas[..., :3], pairs)
+    for column, (fast, slow) in enumerate(pairs):
+        np.testing.assert_array_equal(grid[..., column], indicators.crossover(emas[..., fast], smas[..., slow]))
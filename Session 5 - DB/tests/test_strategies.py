@@ -0,0 +1,12 @@
+import pickle
+
+from strategies import EMACross1020
+
+
+def test_variants_pickle():
+    variant = EMACross1020.variant(fast_span=8)
+    copy = pickle.loads(pickle.dumps(variant))
+
+    assert copy.name == EMACross1020.name and copy.timeframe == EMACross1020.timeframe
+    assert [feature.name for feature in copy.features] == ["8EMA", "20EMA", "Cross"]
+    assert [feature.name for feature in EMACross1020.features] == ["10EMA", "20EMA", "Cross"]
@@ -0,0 +1,32 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from sweep import combination_key, configure, invalid_metrics
+
+
+def test_invalid_metrics():
+    report = {'sharpe': np.nan, 'sortino': np.inf, 'return': 1.5, 'winners': 3, 'avg_hold_time': "1 day"}
+    assert invalid_metrics(report) == ['sharpe', 'sortino']
+    assert invalid_metrics({'sharpe': -0.5, 'closed_trades': 0}) == []
+
+
+def test_combination_key_covers_run_settings():
+    params = {'EMACross1020.fast_span': 8}
+    key = combination_key(params, "2019-01-01", None, {'feature_workers': 1})
+
+    assert key == combination_key(params, pd.Timestamp("2019-01-01").value, None, {'feature_workers': 1})
+    assert key != combination_key(params, "2020-01-01", None, {'feature_workers': 1})
+    assert key != combination_key(params, "2019-01-01", "2021-01-01", {'feature_workers': 1})
+    assert key != combination_key(params, "2019-01-01", None, {'feature_workers': 1, 'event_driven': True})
+
+
+def test_configure_passes_settings_to_constructor():
+    portfolio = configure({'start_equity': 500000, 'EMACross1020.fast_span': 8})
+
+    assert (portfolio.current_equity, portfolio.drawdown_watermark, portfolio.high_watermark) == (500000,) * 3
+    assert portfolio.strategies['EMACross1020']['object'].fast_ema.name == "8EMA"
+
+    for params in ({'correlation_threshold': 2}, {'no_such_setting': 1}, {'NoSuchStrategy.fast_span': 8}):
+        with pytest.raises(ValueError):
+            configure(params)
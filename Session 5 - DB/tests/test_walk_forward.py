@@ -0,0 +1,19 @@
+import numpy as np
+
+from timestamps import to_epoch
+from walk_forward import folds, objective_value
+
+
+def test_folds_are_consecutive():
+    windows = folds("2018-01-01", "2020-12-31", train_months=12, test_months=6)
+
+    assert windows[0][:3] == (to_epoch("2018-01-01"), to_epoch("2019-01-01") - 1, to_epoch("2019-01-01"))
+    for previous, current in zip(windows, windows[1:]):
+        assert current[2] == previous[3] + 1
+    assert windows[-1][3] == to_epoch("2020-12-31")
+
+
+def test_non_finite_objectives_are_not_eligible():
+    assert objective_value({'sharpe': 0.5}, "sharpe") == 0.5
+    for report in (None, {'sharpe': np.inf}, {'sharpe': -np.inf}, {'sharpe': np.nan}):
+        assert np.isnan(objective_value(report, "sharpe"))
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+
+
+# Internally all bar, signal, position and trade timestamps are int64 nanoseconds since the unix epoch (UTC).
+# Conversion to datetime objects or strings should only happen when results are displayed or saved.
+NS_PER_SECOND = 10 ** 9
+NS_PER_MINUTE = 60 * NS_PER_SECOND
+NS_PER_HOUR = 60 * NS_PER_MINUTE
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+# Nominal bar duration per timeframe. Monthly bars have no fixed duration.
+TIMEFRAME_NS = {
+    "1m": NS_PER_MINUTE, "2m": 2 * NS_PER_MINUTE, "5m": 5 * NS_PER_MINUTE, "15m": 15 * NS_PER_MINUTE,
+    "30m": 30 * NS_PER_MINUTE, "60m": NS_PER_HOUR, "90m": 90 * NS_PER_MINUTE, "1h": NS_PER_HOUR,
+    "1d": NS_PER_DAY, "5d": 5 * NS_PER_DAY, "1wk": 7 * NS_PER_DAY, "1mo": None, "3mo": None
+}
+
+TIMESTAMP_KEYS = ['timestamp', 'open_timestamp', 'close_timestamp']
+
+
+def to_epoch_index(index: pd.Index) -> pd.Index:
+    """
+    Convert a datetime-like index to an int64 epoch nanosecond index.
+    Timezone-aware values are converted to UTC.
+    """
+    values = pd.DatetimeIndex(index)
+    if values.tz is not None:
+        values = values.tz_convert("UTC").tz_localize(None)
+
+    return pd.Index(values.values.astype("datetime64[ns]").view(np.int64), name="Date")
+
+
+def to_epoch(value) -> int:
+    """
+    Convert an epoch nanosecond int, datetime or date string to epoch nanoseconds.
+    """
+    return int(pd.Timestamp(value).value)
+
+
+def to_datetime(timestamp: int) -> datetime:
+    """
+    Convert epoch nanoseconds to a (naive, UTC) datetime.
+    """
+    return pd.Timestamp(int(timestamp)).to_pydatetime()
+
+
+def to_str(timestamp: int) -> str:
+    """
+    Format epoch nanoseconds as "%Y-%m-%d %H:%M:%S" for output.
+    """
+    return str(pd.Timestamp(int(timestamp)))
+
+
+def to_timedelta(duration: int) -> timedelta:
+    """
+    Convert a nanosecond duration to a timedelta.
+    """
+    return timedelta(microseconds=int(duration) // 1000)
+
+
+def format_records(records: list, keys=TIMESTAMP_KEYS) -> list:
+    """
+    Return copies of the given records (dicts) with epoch timestamp fields formatted as strings.
+    Used at the output boundary only; the source records are not modified.
+    """
+    formatted = []
+    for record in records:
+        record = dict(record)
+        for key in keys:
+            if record.get(key) is not None:
+                record[key] = to_str(record[key])
+        formatted.append(record)
+
+    return formatted
@@ -0,0 +1,158 @@
+import pandas as pd
+import numpy as np
+
+from timestamps import NS_PER_DAY, TIMEFRAME_NS
+
+
+OHLC = ['Open', 'High', 'Low', 'Close']
+
+# Asset classes that trade 24/7. All other asset classes are assumed to trade on weekdays only
+# (daily bars) or within a single UTC day (intra-daily bars). Exchange holidays are not modelled,
+# so holidays will show up as gaps for non-continuous markets.
+CONTINUOUS_ASSET_CLASSES = ["CRYPTO"]
+
+REPORT_COLUMNS = ['asset_class', 'symbol', 'timeframe', 'rows', 'duplicates', 'non_monotonic', 'nan_rows',
+                  'ohlc_errors', 'non_positive', 'gaps', 'missing_bars', 'largest_gap']
+
+
+def check_dataset(df: pd.DataFrame, timeframe: str, continuous=False) -> dict:
+    """
+    Run vectorized data-quality checks over a single dataset.
+
+    Args:
+        df: OHLCV dataframe indexed by epoch nanosecond timestamps.
+        timeframe: bar granularity of the dataset, used for gap detection.
+        continuous: True if the market trades 24/7.
+
+    Returns:
+        Dict of issue counts, see REPORT_COLUMNS.
+
+    Raises:
+        None.
+    """
+
+    index = np.asarray(df.index, dtype=np.int64)
+    ohlc = df[OHLC].to_numpy(dtype=np.float64)
+    o, h, l, c = ohlc.T
+    diffs = np.diff(index)
+
+    # Rows with missing values, and rows where the bar range does not contain the open and close.
+    nan_rows = np.isnan(ohlc).any(axis=1)
+    ohlc_errors = (h < np.maximum(o, c)) | (l > np.minimum(o, c)) | (h < l)
+    non_positive = (ohlc <= 0).any(axis=1)
+
+    # Gaps are measured against the expected calendar on the sorted, de-duplicated index.
+    gaps, missing_bars, largest_gap = 0, 0, 0
+    step = TIMEFRAME_NS.get(timeframe)
+    if step is not None and index.shape[0] > 1:
+        unique = np.unique(index)
+        prev, curr = unique[:-1], unique[1:]
+
+        if continuous:
+            missing = (curr - prev) // step - 1
+        elif step >= NS_PER_DAY:
+            # Count weekdays strictly between consecutive bars.
+            days = (unique // NS_PER_DAY).astype("datetime64[D]")
+            missing = np.busday_count(days[:-1] + 1, days[1:]) // (step // NS_PER_DAY)
+        else:
+            # Only count gaps within the same trading day, session breaks are expected.
+            same_day = (prev // NS_PER_DAY) == (curr // NS_PER_DAY)
+            missing = np.where(same_day, (curr - prev) // step - 1, 0)
+
+        missing = np.maximum(missing, 0)
+        gaps = int(np.count_nonzero(missing))
+        missing_bars = int(missing.sum())
+        largest_gap = int(missing.max()) if missing.shape[0] > 0 else 0
+
+    return {
+        'rows': int(index.shape[0]),
+        'duplicates': int(df.index.duplicated().sum()),
+        'non_monotonic': int(np.count_nonzero(diffs < 0)),
+        'nan_rows': int(np.count_nonzero(nan_rows)),
+        'ohlc_errors': int(np.count_nonzero(ohlc_errors & ~nan_rows)),
+        'non_positive': int(np.count_nonzero(non_positive)),
+        'gaps': gaps,
+        'missing_bars': missing_bars,
+        'largest_gap': largest_gap
+    }
+
+
+def repair_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a repaired copy of the dataset:
+        - index sorted, duplicate timestamps dropped (last value kept).
+        - non-positive prices treated as missing, missing values padded with their previous neighbour,
+          leading rows that cannot be padded dropped.
+        - High/Low widened to contain Open and Close.
+
+    Gaps are not filled here, see Backtester.apply_features_all_datasets() for calendar re-indexing.
+    """
+
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="mergesort")
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep="last")]
+
+    ohlc = df[OHLC].to_numpy(dtype=np.float64, copy=True)
+    ohlc[ohlc <= 0] = np.nan
+    ohlc = pd.DataFrame(ohlc, index=df.index, columns=OHLC).ffill()
+
+    df = df.assign(**{col: ohlc[col] for col in OHLC})
+    df = df[ohlc.notna().all(axis=1).to_numpy()]
+    if 'Volume' in df.columns:
+        df = df.assign(Volume=df['Volume'].fillna(0))
+
+    values = df[OHLC].to_numpy()
+    return df.assign(High=values.max(axis=1), Low=values.min(axis=1))
+
+
+def validate_datasets(root: dict, symbols=None, repair=False) -> pd.DataFrame:
+    """
+    Check every loaded dataset for duplicate timestamps, non-monotonic index, missing values,
+    inconsistent OHLC values, non-positive prices and gaps against the expected calendar.
+
+    Args:
+        root: nested dict of dataframes as formatted by Backtester.load_local_data().
+            i.e data[asset_class][symbol][timeframe]
+        symbols: optional list of symbols to check, all loaded datasets are checked if None.
+        repair: if True, datasets with issues are replaced in root with a repaired copy (see repair_dataset()).
+
+    Returns:
+        Report dataframe, one row per dataset.
+
+    Raises:
+        None.
+    """
+
+    rows = []
+    for asset_class in root.keys():
+        for symbol in root[asset_class].keys():
+            if symbols is not None and symbol not in symbols:
+                continue
+
+            for timeframe in root[asset_class][symbol].keys():
+                df = root[asset_class][symbol][timeframe]
+                result = check_dataset(df, timeframe, asset_class in CONTINUOUS_ASSET_CLASSES)
+
+                if repair and (result['duplicates'] or result['non_monotonic'] or result['nan_rows']
+                               or result['ohlc_errors'] or result['non_positive']):
+                    root[asset_class][symbol][timeframe] = repair_dataset(df)
+
+                rows.append({'asset_class': asset_class, 'symbol': symbol, 'timeframe': timeframe, **result})
+
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def summarise_report(report: pd.DataFrame) -> str:
+    """
+    Return a compact text summary of datasets with data-quality issues.
+    """
+
+    issues = report.drop(columns=['asset_class', 'symbol', 'timeframe', 'rows', 'largest_gap']).sum(axis=1) > 0
+    flagged = report[issues]
+
+    output = f"Validated {report.shape[0]} datasets, {flagged.shape[0]} with issues."
+    if flagged.shape[0] > 0:
+        output += "\n" + flagged.to_string(index=False)
+
+    return output
@@ -0,0 +1,174 @@
+import numpy as np
+
+
+# Array versions of the position logic in Backtester.process_signal() and TestPortfolio.update_price(),
+# for strategies whose signals depend only on the bar they occur on (see Backtester.run_vectorized()).
+
+
+def signal_bars(columns, strategy, start_index: int, finish_index: int) -> np.ndarray:
+    """
+    Bars in [start_index, finish_index) of a dataset's frame.Columns on which strategy may signal.
+
+    Strategies with a "signal_column" attribute only signal where that column is set (not None or 0),
+    others are assumed to be able to signal on every bar.
+    """
+
+    column = getattr(strategy, "signal_column", None)
+    if column is None:
+        return np.arange(start_index, finish_index)
+
+    values = columns.column(column)[start_index:finish_index]
+
+    return start_index + np.flatnonzero(np.not_equal(values, None) & np.not_equal(values, 0))
+
+
+def stop_bar(arrays: dict, direction: str, stop: float, index: int, finish_index: int) -> int:
+    """
+    First bar in [index, finish_index) of a dataset on which the stop of a position in direction triggers, or None.
+    Padded bars (zero close) never trigger stops.
+    """
+
+    open_bars = arrays['Close'][index:finish_index] != 0
+
+    if direction == "BUY":
+        triggered = open_bars & (arrays['Low'][index:finish_index] <= stop)
+    else:
+        triggered = open_bars & (arrays['High'][index:finish_index] >= stop)
+
+    bars = np.flatnonzero(triggered)
+    return index + int(bars[0]) if len(bars) > 0 else None
+
+
+def next_opposite(directions: np.ndarray) -> np.ndarray:
+    """
+    For each signal, position of the next signal in the opposite direction, or len(directions) if none.
+    """
+
+    n = len(directions)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Signals form runs of the same direction; the next opposite signal is the start of the next run.
+    changes = np.flatnonzero(directions[1:] != directions[:-1]) + 1
+    starts = np.append(changes, n)
+    runs = np.searchsorted(changes, np.arange(n), side="right")
+
+    return starts[runs]
+
+
+def position_fills(bars: np.ndarray, directions: np.ndarray, entries: np.ndarray, stops: np.ndarray,
+                   low: np.ndarray, high: np.ndarray, close: np.ndarray, finish_index: int) -> dict:
+    """
+    Derive the positions a single strategy holds on one dataset from its signals, as the bar loop would
+    with no portfolio rule rejecting an entry.
+
+    With no position, a signal opens one (unless its entry equals its stop). A signal in the opposite
+    direction closes the position at the signal's entry price, without opening a new one; signals in the
+    same direction are ignored. A stop closes the position at the stop price on the first bar from the
+    entry bar whose low (BUY) or high (SELL) reaches it, checked after that bar's signal. Padded bars
+    (zero close) never trigger stops.
+
+    Stops are found with one vectorized search per position over the bars it is held, so the cost scales
+    with the number of signals plus the bars held, rather than bars x signals.
+
+    Args:
+        bars: frame rows of the signals, ascending.
+        directions: "BUY"/"SELL" of each signal.
+        entries: entry price of each signal.
+        stops: stop price of each signal.
+        low, high, close: the dataset's columns.
+        finish_index: bars [.., finish_index) are simulated.
+
+    Returns:
+        Dict of arrays, one entry per position:
+            'signal': position in the signal arrays of the opening signal.
+            'open_bar': frame row the position opened on.
+            'close_bar': frame row the position closed on, -1 if still open at finish_index.
+            'exit_signal': position of the closing signal, -1 if closed by its stop or still open.
+            'exit': exit price, NaN if still open.
+
+    Raises:
+        None.
+    """
+
+    opposite = next_opposite(directions)
+    count = len(bars)
+
+    signal, open_bar, close_bar, exit_signal, exit = [], [], [], [], []
+    k = 0
+    while k < count:
+        if entries[k] == stops[k]:
+            k += 1
+            continue
+
+        start = int(bars[k])
+        closing = int(opposite[k])
+        end = int(bars[closing]) if closing < count else finish_index
+
+        if directions[k] == "BUY":
+            triggered = low[start:end] <= stops[k]
+        else:
+            triggered = high[start:end] >= stops[k]
+        hits = np.flatnonzero(triggered & (close[start:end] != 0))
+
+        signal.append(k)
+        open_bar.append(start)
+        if len(hits) > 0:
+            stopped = start + int(hits[0])
+            close_bar.append(stopped)
+            exit_signal.append(-1)
+            exit.append(stops[k])
+            k = int(np.searchsorted(bars, stopped, side="right"))
+        elif closing < count:
+            close_bar.append(end)
+            exit_signal.append(closing)
+            exit.append(entries[closing])
+            k = closing + 1
+        else:
+            close_bar.append(-1)
+            exit_signal.append(-1)
+            exit.append(np.nan)
+            break
+
+    return {
+        'signal': np.array(signal, dtype=np.int64),
+        'open_bar': np.array(open_bar, dtype=np.int64),
+        'close_bar': np.array(close_bar, dtype=np.int64),
+        'exit_signal': np.array(exit_signal, dtype=np.int64),
+        'exit': np.array(exit, dtype=np.float64)}
+
+
+def trade_pnl(buy: np.ndarray, entry: np.ndarray, exit: np.ndarray, size: np.ndarray, fees: np.ndarray) -> tuple:
+    """
+    Per-trade delta (% move from entry to exit) and net pnl, as TestPortfolio.calculate_pnl_for_trade().
+
+    Args:
+        buy: True for long positions.
+        entry, exit: prices.
+        size: position sizes.
+        fees: total fees charged against each trade.
+
+    Returns:
+        (delta, net_pnl) arrays.
+    """
+
+    delta = np.abs((entry - exit) / entry) * 100
+    pnl = np.abs((size / 100) * delta) - fees
+    won = np.where(buy, exit > entry, exit < entry)
+
+    return delta, np.where(won, pnl, -pnl)
+
+
+def target_delta(buy: np.ndarray, entry: np.ndarray, delta: np.ndarray, stop_delta: np.ndarray, targets: list,
+                 net_pnl: np.ndarray, target_r: float) -> np.ndarray:
+    """
+    Per-trade target delta as TestPortfolio.calculate_pnl_for_trade(): the achieved delta for winners,
+    otherwise the distance to the final take profit target, or target_r times the stop distance if none.
+    """
+
+    final = np.array([t[-1][0] if len(t) > 0 else np.nan for t in targets], dtype=np.float64)
+    default = np.where(buy, (entry / 100) * (100 + (target_r * stop_delta)),
+                       (entry / 100) * (100 - (target_r * stop_delta)))
+    target = np.where(np.isnan(final), default, final)
+
+    return np.where(net_pnl > 0, delta, np.abs((entry - target) / entry) * 100)
@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+
+from portfolios import TestPortfolio
+from backtest import Backtester, SYMBOLS
+from parallel import default_workers
+from timestamps import to_epoch, to_str
+import sweep
+
+
+# Walk-forward optimisation: the timeline is split into consecutive folds of a training window followed by
+# a test window. On each fold every combination of a parameter grid (see sweep.py) is run over the training
+# window, and the combination with the best objective is then run over the test window. Test windows follow
+# each other without overlap, so their trades form one out-of-sample record.
+#
+# Data is loaded once and shared with the worker processes. Features are computed over whole datasets
+# (Backtester full_history_features), so every window of a combination reuses the same cached features.
+# Training runs of all folds are independent and run in parallel, then all test runs.
+#
+# Runs that fail (raise) are retried once. A fold fails, and is left out of the out-of-sample record, if any of
+# its runs still fails, or if no training run has a finite objective. Combinations without a report or with a
+# NaN or infinite objective are not eligible; of the rest, the first in grid order with the highest objective
+# is chosen. Fold selection therefore only depends on the simulations, not on which runs happened to fail.
+#
+# Usage: python walk_forward.py
+
+
+GRID = {
+    "max_risk_per_trade_percentage": [1, 2.5],
+    "EMACross1020.fast_span": [8, 10, 12],
+}
+TRAIN_MONTHS = 12
+TEST_MONTHS = 3
+OBJECTIVE = "sharpe"
+
+
+def folds(first, last, train_months: int, test_months: int) -> list:
+    """
+    Consecutive (train start, train finish, test start, test finish) windows between first and last.
+
+    Each fold moves forward by test_months, so test windows cover the timeline after the first training
+    window without overlapping. Finish timestamps are inclusive, one nanosecond before the next window.
+    The last test window may be shorter, ending at last.
+
+    Args:
+        first, last: timestamps (epoch nanoseconds, datetimes or date strings) of the timeline.
+        train_months: length of each training window.
+        test_months: length of each test window.
+
+    Returns:
+        List of tuples of epoch nanosecond timestamps.
+
+    Raises:
+        ValueError if the timeline is shorter than one training window.
+    """
+
+    first, last = pd.Timestamp(to_epoch(first)), pd.Timestamp(to_epoch(last))
+    windows = []
+    train_start = first
+    while True:
+        test_start = train_start + pd.DateOffset(months=train_months)
+        if test_start >= last:
+            break
+        test_finish = min(test_start + pd.DateOffset(months=test_months), last + pd.Timedelta(1))
+        windows.append((train_start.value, test_start.value - 1, test_start.value, test_finish.value - 1))
+        train_start = train_start + pd.DateOffset(months=test_months)
+
+    if len(windows) == 0:
+        raise ValueError("Timeline is shorter than one training window.")
+
+    return windows
+
+
+def run_window(params: dict, start: int, finish: int, backtester_args: dict) -> tuple:
+    """
+    Worker: simulate one combination of parameters over [start, finish].
+
+    Returns:
+        (portfolio report, trade history). The report is None if metrics could not be calculated, e.g. too
+        few trades in the window, and both are None if the simulation fails.
+    """
+
+    try:
+        portfolio = sweep.configure(params)
+        bt = Backtester(portfolio, data=sweep._data, use_database=False, **backtester_args)
+        bt.start(start, finish, save=False, analyse=False)
+    except Exception as e:
+        print(f"Walk forward: {params} over {to_str(start)} - {to_str(finish)} failed: {e!r}")
+        return None, None
+
+    try:
+        portfolio.post_simulation_analysis(save=False)
+    except Exception as e:
+        print(f"Walk forward: no metrics for {params} over {to_str(start)} - {to_str(finish)}: {e!r}")
+
+    return portfolio.report, portfolio.trade_history
+
+
+def objective_value(report: dict, objective: str) -> float:
+    """
+    The objective of a run's report, or NaN if the run has no report or the objective is not finite.
+    """
+
+    if report is None:
+        return np.nan
+
+    value = float(report[objective])
+    return value if np.isfinite(value) else np.nan
+
+
+def results(pool, futures: list, args: list) -> list:
+    """
+    Results of run_window futures, resubmitting runs that failed once. Runs that fail again stay (None, None).
+    """
+
+    done = [future.result() for future in futures]
+    retries = {number: pool.submit(run_window, *args[number]) for number, (report, history) in enumerate(done)
+               if history is None}
+    for number, future in retries.items():
+        print(f"Walk forward: retrying {args[number][0]}.")
+        done[number] = future.result()
+
+    return done
+
+
+def walk_forward(grid: dict, train_months=TRAIN_MONTHS, test_months=TEST_MONTHS, objective=OBJECTIVE, first=None,
+                 last=None, workers=None, backtester_args=None) -> tuple:
+    """
+    Run a walk-forward optimisation of grid over the test portfolio.
+
+    Args:
+        grid: dict of parameter: list of values, see sweep.py for parameter names.
+        train_months: length of each training window.
+        test_months: length of each test window.
+        objective: key of TestPortfolio.report maximised on training windows.
+        first, last: optional start and end of the timeline, defaults to the span of the portfolio's datasets.
+        workers: number of worker processes, defaults to the number of CPUs.
+        backtester_args: optional dict of Backtester keyword arguments.
+
+    Returns:
+        (folds, equity):
+            folds: table with one row per fold: windows (epoch nanoseconds), status ("ok" or "failed: <reason>"),
+                chosen parameters, training objective and test report.
+            equity: out-of-sample trade record of all test windows in close order, with the equity from
+                the portfolio's start equity after each trade.
+
+    Raises:
+        ValueError if the timeline is shorter than one training window.
+    """
+
+    backtester_args = {'feature_workers': 1, 'full_history_features': True, **(backtester_args or {})}
+    workers = workers or default_workers()
+
+    data = Backtester.load_local_data(SYMBOLS)
+    portfolio = TestPortfolio()
+    if first is None or last is None:
+        indexes = [data[a][s][t].index for a in portfolio.assets for s in portfolio.assets[a] for t in data[a][s]]
+        first = first if first is not None else min(index[0] for index in indexes)
+        last = last if last is not None else max(index[-1] for index in indexes)
+
+    windows = folds(first, last, train_months, test_months)
+    params = sweep.combinations(grid)
+    print(f"Walk forward: {len(windows)} folds of {len(params)} combinations.")
+
+    rows = []
+    trades = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=sweep._set_data, initargs=(data,)) as pool:
+
+        # Training runs, fold by combination.
+        args = [(p, train_start, train_finish, backtester_args) for train_start, train_finish, test_start, test_finish
+                in windows for p in params]
+        training = results(pool, [pool.submit(run_window, *a) for a in args], args)
+        training = [training[fold * len(params):(fold + 1) * len(params)] for fold in range(len(windows))]
+
+        # Test runs of each fold's best combination.
+        scores, chosen, failures = [], {}, {}
+        for fold, (window, runs) in enumerate(zip(windows, training)):
+            scores.append(np.array([objective_value(report, objective) for report, history in runs]))
+            if any(history is None for report, history in runs):
+                failures[fold] = "training run failed"
+            elif np.all(np.isnan(scores[fold])):
+                failures[fold] = f"no training run with a finite {objective}"
+            else:
+                chosen[fold] = int(np.nanargmax(scores[fold]))
+
+        args = [(params[best], windows[fold][2], windows[fold][3], backtester_args) for fold, best in chosen.items()]
+        tests = dict(zip(chosen, results(pool, [pool.submit(run_window, *a) for a in args], args)))
+
+        for fold, window in enumerate(windows):
+            train_start, train_finish, test_start, test_finish = window
+            row = {'fold': fold, 'train_start': train_start, 'train_finish': train_finish, 'test_start': test_start,
+                   'test_finish': test_finish}
+
+            if fold in tests and tests[fold][1] is None:
+                failures[fold] = "test run failed"
+            if fold in failures:
+                print(f"Walk forward: fold {fold} failed ({failures[fold]}), left out of the record.")
+                rows.append({**row, 'status': "failed: " + failures[fold]})
+                continue
+
+            best = chosen[fold]
+            report, history = tests[fold]
+            rows.append({**row, 'status': "ok", **params[best], f'train_{objective}': scores[fold][best],
+                         **{f'test_{key}': value for key, value in (report or {}).items()}})
+            trades.extend({'fold': fold, **trade} for trade in history)
+
+    equity = pd.DataFrame(trades, columns=['fold', 'symbol', 'strategy', 'side', 'open_timestamp', 'close_timestamp',
+                                           'exit_mode', 'net_pnl'])
+    equity = equity.sort_values(['close_timestamp', 'fold'], kind="stable").reset_index(drop=True)
+    equity['equity'] = portfolio.start_equity + equity['net_pnl'].cumsum()
+
+    return pd.DataFrame(rows), equity
+
+
+if __name__ == "__main__":
+    pd.set_option('display.width', None)
+    folds_table, equity_record = walk_forward(GRID)
+
+    # Timestamps are formatted for output only.
+    for table, columns in ((folds_table, ['train_start', 'train_finish', 'test_start', 'test_finish']),
+                           (equity_record, ['open_timestamp', 'close_timestamp'])):
+        for column in columns:
+            table[column] = table[column].map(to_str)
+
+    print(folds_table.to_string(index=False))
+    print(equity_record.tail(20).to_string(index=False))